@@ -0,0 +1,33 @@
+import asyncio
+
+from budget import Budget
+from graphplan import GraphPlan
+
+
+async def solve_async(r_fact, r_ops=None, budget=None, goal=None, executor=None, **options):
+    """
+    Solves a problem in an executor (the default thread pool of the loop by default) without blocking the event loop.
+    Cancelling the returned coroutine sets the cancel event of the budget: the solve stops at its next check, and the
+    cancellation is propagated once the executor is released.
+    :param r_fact: path of a r_fact file
+    :param r_ops: path of a r_ops file to ground the actions from, or None for the built-in rocket actions
+    :param budget: Budget object or None for no limit other than cancellation
+    :param goal: a bitset of propositions or None for the goal of the r_fact file
+    :param executor: concurrent.futures.Executor object or None
+    :param options: other GraphPlan arguments
+    :return: SolveResult object
+    """
+    budget = budget if budget is not None else Budget()
+    loop = asyncio.get_running_loop()
+
+    def run():
+        return GraphPlan(r_fact, r_ops, **options).solve(goal, budget)
+
+    future = loop.run_in_executor(executor, run)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        budget.cancel.set()
+        # The thread cannot be interrupted, wait for it to notice the event before giving the executor back
+        await asyncio.wait([future])
+        raise
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+from graphplan import GraphPlan
+from stats import SolverStats
+
+
+def run_graphplan(r_fact, r_ops=None, **options):
+    """
+    Solves a problem with GraphPlan and returns the JSON-serializable result shared by the batch, regression and
+    portfolio scripts: the problem, the status ('solved', 'no-plan' or 'error'), the wall time and, without error, the
+    number of layers of the plan and for a plan, its actions without No-op actions (sorted in each layer) and its
+    makespan.
+    :param r_fact: path of a r_fact file
+    :param r_ops: path of a r_ops file to ground the actions from, or None for the built-in rocket actions
+    :param options: GraphPlan arguments
+    :return: (dict, GraphPlan object or None after an error, layered plan or None)
+    """
+    result = {'problem': r_fact}
+    start = time.perf_counter()
+    try:
+        gp = GraphPlan(r_fact, r_ops, **options)
+        layered_plan = gp.graphplan()
+    except Exception as e:
+        result.update(status='error', error=f'{type(e).__name__}: {e}', wall_time=time.perf_counter() - start)
+        return result, None, None
+    result['wall_time'] = time.perf_counter() - start
+    if layered_plan is None:
+        result.update(status='no-plan', layers=None)
+    else:
+        plan = [sorted(str(action) for action in layer if action.name != 'NOOP') for layer in layered_plan]
+        result.update(status='solved', layers=len(layered_plan), plan=plan, makespan=sum(1 for layer in plan if layer))
+    return result, gp, layered_plan
+
+
+def solve(r_fact, measure_heap=False, r_ops=None, relevance=False, engine='graphplan', symmetry=False,
+          mutex_backend='python'):
+    """
+    Solves one problem and returns its JSON-serializable result.
+    :param r_fact: path of a r_fact file
+    :param measure_heap: if True, the peak of the Python heap during the solve is measured with tracemalloc (slower)
+    :param r_ops: path of a r_ops file to ground the actions from, or None for the built-in rocket actions
+    :param relevance: if True, the graph only contains the actions relevant to the goal
+    :param engine: 'graphplan' (backward extraction), 'forward' (heuristic forward search) or 'sat' (CNF encoding)
+    :param symmetry: if True, the extraction exploits the symmetries between interchangeable objects
+    :param mutex_backend: 'python' or 'numpy' (boolean matrices, requires NumPy)
+    :return: dict
+    """
+    if measure_heap:
+        tracemalloc.start()
+    stats = SolverStats()
+    result, gp, _ = run_graphplan(r_fact, r_ops, relevance=relevance, stats=stats, engine=engine, symmetry=symmetry,
+                                  mutex_backend=mutex_backend)
+    if measure_heap:
+        result['peak_heap'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # High-water mark of the worker process since it started: an upper bound of the peak of this problem when the worker
+    # solved others before it (see the max_tasks argument of WorkerPool)
+    result['worker_peak_memory'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    if gp is not None:
+        result['stats'] = stats.as_dict()
+    return result
+
+
+def worker(connection, task):
+    """
+    Calls task with the tuples of arguments received on the connection and sends back the results, until the connection
+    is closed or receives None.
+    """
+    while True:
+        try:
+            args = connection.recv()
+        except EOFError:
+            return
+        if args is None:
+            return
+        connection.send(task(*args))
+
+
+class WorkerPool:
+    """
+    Pool of reused worker processes, each one running a task at a time (solve by default).
+    A worker that crashes or exceeds the timeout is killed and replaced, without affecting the other tasks.
+    With max_tasks, a worker is also replaced after running that many tasks (1 gives each task a fresh process).
+    """
+    def __init__(self, size, task=solve, max_tasks=None):
+        self.task = task
+        self.max_tasks = max_tasks
+        # done[connection] = number of tasks run by the worker of the connection
+        self.done = {}
+        self.idle = [self.start_worker() for _ in range(size)]
+        # busy[connection] = (process, label of the task, deadline)
+        self.busy = {}
+
+    def start_worker(self):
+        parent_connection, child_connection = Pipe()
+        process = Process(target=worker, args=(child_connection, self.task), daemon=True)
+        process.start()
+        child_connection.close()
+        self.done[parent_connection] = 0
+        return process, parent_connection
+
+    def replace(self, process, connection):
+        process.kill()
+        process.join()
+        connection.close()
+        del self.done[connection]
+        self.idle.append(self.start_worker())
+
+    def retire(self, process, connection):
+        connection.send(None)
+        process.join()
+        connection.close()
+        del self.done[connection]
+        self.idle.append(self.start_worker())
+
+    def run(self, tasks, timeout=None, labels=None):
+        """
+        Runs the tasks and yields their labels and results in completion order. The result of a task that exceeds the
+        timeout is {'status': 'timeout', 'wall_time': timeout}, and the result of a task whose worker crashes is
+        {'status': 'crashed', 'error': ...}.
+        :param tasks: list of tuples of arguments for the task
+        :param timeout: maximal wall time in seconds for each task, or None
+        :param labels: list of the labels identifying the tasks, the first argument of each task by default
+        :return: generator of tuples (label, dict)
+        """
+        pending = deque(zip(labels if labels is not None else [args[0] for args in tasks], tasks))
+        while pending or self.busy:
+            while pending and self.idle:
+                process, connection = self.idle.pop()
+                label, args = pending.popleft()
+                connection.send(args)
+                self.busy[connection] = (process, label, time.monotonic() + timeout if timeout is not None else None)
+            deadlines = [deadline for _, _, deadline in self.busy.values() if deadline is not None]
+            wait_time = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            for connection in wait(list(self.busy), wait_time):
+                process, label, _ = self.busy.pop(connection)
+                try:
+                    result = connection.recv()
+                except (EOFError, OSError):
+                    process.join()
+                    result = {'status': 'crashed', 'error': f'worker exit code {process.exitcode}'}
+                    connection.close()
+                    del self.done[connection]
+                    self.idle.append(self.start_worker())
+                else:
+                    self.done[connection] += 1
+                    if self.max_tasks is not None and self.done[connection] >= self.max_tasks:
+                        self.retire(process, connection)
+                    else:
+                        self.idle.append((process, connection))
+                yield label, result
+            now = time.monotonic()
+            for connection, (process, label, deadline) in list(self.busy.items()):
+                if deadline is not None and deadline <= now:
+                    del self.busy[connection]
+                    self.replace(process, connection)
+                    yield label, {'status': 'timeout', 'wall_time': timeout}
+
+    def close(self):
+        for process, connection in self.idle:
+            connection.send(None)
+            process.join()
+            connection.close()
+        for connection, (process, _, _) in self.busy.items():
+            process.kill()
+            process.join()
+        self.idle, self.busy, self.done = [], {}, {}
+
+
+def find_problems(paths, pattern='*r_fact*.txt'):
+    """
+    Returns the sorted r_fact files designated by a list of files, directories (searched with pattern) and globs.
+    :param paths: list of str
+    :param pattern: glob pattern used inside directories
+    :return: list of str
+    """
+    r_facts = set()
+    for path in paths:
+        if os.path.isdir(path):
+            r_facts.update(glob.glob(os.path.join(path, pattern)))
+        else:
+            r_facts.update(glob.glob(path))
+    return sorted(r_facts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solves many r_fact problems in parallel and writes one JSON line per problem.')
+    parser.add_argument('paths', nargs='+', help='r_fact files, directories or glob patterns')
+    parser.add_argument('--pattern', default='*r_fact*.txt', help='pattern of the r_fact files inside directories')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--timeout', type=float, default=None, help='maximal wall time in seconds for each problem')
+    parser.add_argument('--output', default=None, help='file to write the JSON lines to (standard output by default)')
+    parser.add_argument('--ops', default=None, help='r_ops file to ground the reachable actions from')
+    parser.add_argument('--relevance', action='store_true', help='leave the actions irrelevant to the goal out of the graph')
+    parser.add_argument('--engine', default='graphplan', choices=('graphplan', 'forward', 'sat'), help='plan search engine')
+    parser.add_argument('--symmetry', action='store_true', help='prune the search with the symmetries between objects')
+    parser.add_argument('--mutex-backend', default='python', choices=('python', 'numpy'), help='layer expansion backend')
+    parser.add_argument('--measure-heap', action='store_true', help='measure the peak of the Python heap of each solve')
+    parser.add_argument('--max-tasks', type=int, default=None, help='number of problems solved by a worker before it is '
+                                                                  'replaced (1 to measure the peak memory of each problem)')
+    args = parser.parse_args()
+
+    r_facts = find_problems(args.paths, args.pattern)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    pool = WorkerPool(max(1, min(args.workers, len(r_facts))), max_tasks=args.max_tasks)
+    try:
+        tasks = [(r_fact, args.measure_heap, args.ops, args.relevance, args.engine, args.symmetry, args.mutex_backend)
+                 for r_fact in r_facts]
+        for r_fact, result in pool.run(tasks, args.timeout):
+            output.write(json.dumps(dict({'problem': r_fact}, **result)) + '\n')
+            output.flush()
+    finally:
+        pool.close()
+        if output is not sys.stdout:
+            output.close()
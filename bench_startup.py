@@ -0,0 +1,52 @@
+import glob
+import time
+import tracemalloc
+
+from domain import InterferenceIndex, RocketDomain
+
+
+def build_dependency_table(rd):
+    """
+    Builds the former all-pairs table of dependencies between actions, kept here only for comparison.
+    :param rd: RocketDomain object
+    :return: dict
+    """
+    return {(action1, action2): (not rd.are_independent(action1, action2)) for action1 in rd.actions for action2 in rd.actions}
+
+
+def build_interference_index(rd):
+    """
+    Builds the interference index and answers every pair of actions once, which is the worst case for its lazy cache.
+    :param rd: RocketDomain object
+    :return: InterferenceIndex object
+    """
+    index = InterferenceIndex(rd.actions, len(rd.propositions))
+    for action1 in rd.actions:
+        for action2 in rd.actions:
+            index.are_interfering(action1, action2)
+    return index
+
+
+def measure(build, rd):
+    """
+    Returns the wall time (in seconds) and the peak memory (in bytes) needed by build(rd).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(rd)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+if __name__ == '__main__':
+    print(f'{"problem":<20}{"actions":>8}{"table time":>12}{"table peak":>12}{"index time":>12}{"index peak":>12}')
+    for r_fact in sorted(glob.glob('examples/*r_fact*.txt')):
+        rd = RocketDomain(r_fact)
+        table_time, table_peak = measure(build_dependency_table, rd)
+        index_time, index_peak = measure(build_interference_index, rd)
+        print(f'{r_fact.split("/")[-1]:<20}{len(rd.actions):>8}'
+              f'{table_time:>11.3f}s{table_peak / 2**20:>10.2f}MB'
+              f'{index_time:>11.3f}s{index_peak / 2**20:>10.2f}MB')
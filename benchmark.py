@@ -0,0 +1,183 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from batch import WorkerPool
+from graphplan import GraphPlan, iter_pairs
+from stats import SolverStats
+
+
+def generate_problem(nb_cargos, nb_rockets, nb_places, seed, goal_ratio=1.0):
+    """
+    Returns the text of a random problem in the r_fact format.
+    Each rocket starts at a random place with fuel and is given a random destination. Each cargo starts where a random rocket
+    starts, and a share goal_ratio of the cargos must be brought to the destination of that rocket, so the problem is solvable.
+    :param nb_cargos: int
+    :param nb_rockets: int
+    :param nb_places: int (at least 2)
+    :param seed: seed of the random generator
+    :param goal_ratio: share of the cargos that appear in the goal
+    :return: str
+    """
+    rng = random.Random(seed)
+    places = [f'p{k}' for k in range(nb_places)]
+    rockets = [f'r{k}' for k in range(nb_rockets)]
+    cargos = [f'c{k}' for k in range(nb_cargos)]
+    starts = {rocket: rng.choice(places) for rocket in rockets}
+    destinations = {rocket: rng.choice([place for place in places if place != starts[rocket]]) for rocket in rockets}
+    carriers = {cargo: rng.choice(rockets) for cargo in cargos}
+    goal_cargos = rng.sample(cargos, round(goal_ratio * nb_cargos))
+
+    objects = [f'({place} PLACE)' for place in places] + [f'({rocket} ROCKET)' for rocket in rockets] \
+        + [f'({cargo} CARGO)' for cargo in cargos]
+    init = [f'(at {rocket} {starts[rocket]})' for rocket in rockets] \
+        + [f'(at {cargo} {starts[carriers[cargo]]})' for cargo in cargos] \
+        + [f'(has-fuel {rocket})' for rocket in rockets]
+    goal = [f'(at {cargo} {destinations[carriers[cargo]]})' for cargo in cargos if cargo in goal_cargos]
+    return '\n' + '\n'.join(objects) + '\n\n(preconds\n' + '\n'.join(init) + ')\n\n(effects\n' + '\n'.join(goal) + ')\n\n'
+
+
+def run_case(r_fact, case):
+    """
+    Solves a problem phase by phase and returns the time, the peak of the Python heap and the counters of each phase.
+    The domain phase builds the GraphPlan object (and its RocketDomain), the expand phase expands the graph until the goal
+    might be reachable, and the extract phase searches for a plan (adding layers if needed).
+    Memory is measured with tracemalloc, which slows down every phase by the same factor.
+    :param r_fact: path of a r_fact file
+    :param case: dict of the parameters of the problem, copied in the result
+    :return: dict
+    """
+    result = dict(case)
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    stats = SolverStats()
+    gp = GraphPlan(r_fact, stats=stats)
+    result['domain_time'] = time.perf_counter() - start
+    result['domain_peak'] = tracemalloc.get_traced_memory()[1]
+    result['actions'] = len(gp.rd.actions)
+    result['propositions'] = len(gp.rd.propositions)
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    reachable = gp.expand_until_reachable(gp.rd.goal_mask)
+    result['expand_time'] = time.perf_counter() - start
+    result['expand_peak'] = tracemalloc.get_traced_memory()[1]
+    result['expand_layers'] = len(gp.layers) - 1
+    result['mutex_action_pairs'] = sum(1 for _ in iter_pairs(gp.layers[-1].mutex_actions))
+    result['mutex_proposition_pairs'] = sum(1 for _ in iter_pairs(gp.layers[-1].mutex_propositions))
+    result['rechecked_pairs'] = sum(layer.rechecked_action_pairs + layer.rechecked_proposition_pairs for layer in gp.layers)
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    layered_plan = gp.extract_plan(gp.rd.goal_mask) if reachable else None
+    result['extract_time'] = time.perf_counter() - start
+    result['extract_peak'] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result['nogood_hits'] = gp.nogood.hits
+    result['nogood_misses'] = gp.nogood.misses
+    result['nogood_size'] = gp.nogood.minimal_size()
+    result['nodes'] = sum(stats.nodes)
+    result['backtracks'] = sum(stats.backtracks)
+    result['providers_calls'] = stats.providers_calls
+    result['status'] = 'solved' if layered_plan is not None else 'no-plan'
+    result['layers'] = len(layered_plan) if layered_plan is not None else None
+    if layered_plan is not None:
+        result['plan_actions'] = sum(1 for layer in layered_plan for action in layer if action.name != 'NOOP')
+    return result
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmark(cargos, rockets, places, seeds, goal_ratio, timeout, workers, output):
+    """
+    Generates a problem for each combination of parameters, solves them in a worker pool and appends the results as JSON
+    lines to the output file, tagged with the current commit.
+    """
+    commit = get_commit()
+    date = time.strftime('%Y-%m-%dT%H:%M:%S')
+    with tempfile.TemporaryDirectory() as directory:
+        tasks = []
+        for nb_cargos, nb_rockets, nb_places, seed in itertools.product(cargos, rockets, places, seeds):
+            case = {'commit': commit, 'date': date, 'cargos': nb_cargos, 'rockets': nb_rockets, 'places': nb_places,
+                    'seed': seed, 'goal_ratio': goal_ratio}
+            r_fact = os.path.join(directory, f'r_fact_{nb_cargos}_{nb_rockets}_{nb_places}_{seed}.txt')
+            with open(r_fact, 'w') as f:
+                f.write(generate_problem(nb_cargos, nb_rockets, nb_places, seed, goal_ratio))
+            tasks.append((r_fact, case))
+        cases = {r_fact: case for r_fact, case in tasks}
+        pool = WorkerPool(max(1, min(workers, len(tasks))), run_case)
+        try:
+            with open(output, 'a') as f:
+                for r_fact, result in pool.run(tasks, timeout):
+                    # The parameters of the problem are not in the result of a timeout or a crash of the worker
+                    result = dict(cases[r_fact], **result)
+                    f.write(json.dumps(result) + '\n')
+                    f.flush()
+                    print(format_result(result))
+        finally:
+            pool.close()
+
+
+def format_result(result):
+    case = f'{result["cargos"]}c {result["rockets"]}r {result["places"]}p seed {result["seed"]}'
+    if result['status'] not in ('solved', 'no-plan'):
+        return f'{case:<22}{result["status"]}'
+    return f'{case:<22}{result["status"]:<9}domain {result["domain_time"]:8.3f}s  expand {result["expand_time"]:8.3f}s  ' \
+           f'extract {result["extract_time"]:8.3f}s  peak {max(result["domain_peak"], result["expand_peak"], result["extract_peak"]) / 2**20:7.2f}MB'
+
+
+def compare(results_path):
+    """
+    Prints, for each problem size, the mean time of each phase for each commit found in the results file.
+    Cases that timed out or crashed are counted separately.
+    """
+    groups = {}
+    with open(results_path) as f:
+        for line in f:
+            result = json.loads(line)
+            key = (result['cargos'], result['rockets'], result['places'], result['commit'])
+            groups.setdefault(key, []).append(result)
+    print(f'{"size":<12}{"commit":<10}{"runs":>5}{"failed":>7}{"domain":>10}{"expand":>10}{"extract":>10}{"peak MB":>9}')
+    for (nb_cargos, nb_rockets, nb_places, commit), results in sorted(groups.items()):
+        done = [result for result in results if result['status'] in ('solved', 'no-plan')]
+        line = f'{f"{nb_cargos}c {nb_rockets}r {nb_places}p":<12}{commit:<10}{len(results):>5}{len(results) - len(done):>7}'
+        if done:
+            mean = lambda name: sum(result[name] for result in done) / len(done)
+            peak = max(max(result['domain_peak'], result['expand_peak'], result['extract_peak']) for result in done)
+            line += f'{mean("domain_time"):>9.3f}s{mean("expand_time"):>9.3f}s{mean("extract_time"):>9.3f}s{peak / 2**20:>9.2f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scaling benchmark of GraphPlan on generated rocket problems.')
+    parser.add_argument('--cargos', type=int, nargs='+', default=[2, 4, 6, 8, 10])
+    parser.add_argument('--rockets', type=int, nargs='+', default=[2, 3])
+    parser.add_argument('--places', type=int, nargs='+', default=[3, 4])
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--goal-ratio', type=float, default=1.0, help='share of the cargos that appear in the goal')
+    parser.add_argument('--timeout', type=float, default=60, help='maximal wall time in seconds for each problem')
+    parser.add_argument('--workers', type=int, default=1, help='number of problems solved in parallel (1 for stable timings)')
+    parser.add_argument('--output', default='benchmark_results.jsonl', help='file the results are appended to')
+    parser.add_argument('--compare', metavar='RESULTS', help='only print the comparison of the commits found in a results file')
+    parser.add_argument('--generate', metavar='PATH', help='only write the problem of the first combination of parameters to PATH')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+    elif args.generate:
+        with open(args.generate, 'w') as f:
+            f.write(generate_problem(args.cargos[0], args.rockets[0], args.places[0], args.seeds[0], args.goal_ratio))
+    else:
+        run_benchmark(args.cargos, args.rockets, args.places, args.seeds, args.goal_ratio, args.timeout, args.workers, args.output)
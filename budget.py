@@ -0,0 +1,100 @@
+import os
+import resource
+import threading
+import time
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised inside the solver when a limit of its Budget is reached, reason being 'time', 'nodes', 'memory' or 'cancelled'.
+    """
+    def __init__(self, reason):
+        super().__init__(f'{reason} budget exhausted' if reason != 'cancelled' else 'solve cancelled')
+        self.reason = reason
+
+
+def get_memory():
+    """
+    Returns the resident memory of the process in bytes (its peak when the current value is not available).
+    :return: int
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Budget:
+    """
+    Limits of a solve: wall-clock time in seconds, search nodes (gp_search calls or states expanded by the forward engine)
+    and resident memory in bytes, each one None for no limit. GraphPlan checks them cooperatively before building a layer
+    and at each search node, and so does the cancel event, which can be set from another thread to stop the solve.
+    """
+    # The memory is read once every MEMORY_CHECK_INTERVAL checks, reading it being much slower than the other checks
+    MEMORY_CHECK_INTERVAL = 1024
+
+    def __init__(self, time_limit=None, node_limit=None, memory_limit=None, cancel=None):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.memory_limit = memory_limit
+        self.cancel = cancel if cancel is not None else threading.Event()
+        self.deadline = None
+        self.nodes = 0
+        self.checks = 0
+
+    def start(self):
+        self.deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.nodes = 0
+        self.checks = 0
+
+    def check(self, node=False):
+        """
+        Raises BudgetExhausted if a limit is reached.
+        :param node: if True, the check is made for a new search node, which is counted
+        """
+        if node:
+            if self.node_limit is not None and self.nodes >= self.node_limit:
+                raise BudgetExhausted('nodes')
+            self.nodes += 1
+        if self.cancel.is_set():
+            raise BudgetExhausted('cancelled')
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise BudgetExhausted('time')
+        self.checks += 1
+        if self.memory_limit is not None and self.checks % self.MEMORY_CHECK_INTERVAL == 1 and get_memory() > self.memory_limit:
+            raise BudgetExhausted('memory')
+
+
+class SolveResult:
+    """
+    Outcome of GraphPlan.solve: status is 'solved' (with the layered plan), 'no-plan' or 'budget-exhausted' (with the
+    reason of BudgetExhausted). The stats are the SolverStats of the solver, if it has one, as they were when it stopped.
+    """
+    def __init__(self, status, plan=None, reason=None, stats=None, layers=0, nodes=0, wall_time=0.0):
+        self.status = status
+        self.plan = plan
+        self.reason = reason
+        self.stats = stats
+        # Number of layers of the graph and search nodes counted by the budget when the solve ended
+        self.layers = layers
+        self.nodes = nodes
+        self.wall_time = wall_time
+
+    @property
+    def solved(self):
+        return self.status == 'solved'
+
+    def as_dict(self):
+        """
+        Returns the result as a JSON-serializable dict, the plan without No-op actions.
+        :return: dict
+        """
+        result = {'status': self.status, 'layers': self.layers, 'nodes': self.nodes, 'wall_time': self.wall_time}
+        if self.plan is not None:
+            result['plan'] = [[str(action) for action in layer if action.name != 'NOOP'] for layer in self.plan]
+        if self.reason is not None:
+            result['reason'] = self.reason
+        if self.stats is not None:
+            result['stats'] = self.stats.as_dict()
+        return result
@@ -1,7 +1,27 @@
+from grounding import ground, parse_operators
+
+
+def bits(mask):
+    """
+    Yields the indexes of the set bits of an integer bitset, lowest first.
+    :param mask: int
+    :return: generator of int
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
 class Proposition:
+    __slots__ = ('name', 'args', 'id', '_hash')
+
     def __init__(self, name, args):
         self.name = name
         self.args = args
+        # Dense index given by RocketDomain.intern_proposition, -1 until the proposition is interned
+        self.id = -1
+        self._hash = hash(name) + hash(tuple(args))
 
     def __str__(self):
         return f'<{self.args[0]} {self.name}{" " + self.args[1] if len(self.args) > 1 else ""}>'
@@ -10,38 +30,101 @@ class Proposition:
         return self.__str__()
     
     def __eq__(self, other):
-        return self.name == other.name and self.args == other.args
+        return self is other or (self.name == other.name and self.args == other.args)
     
     def __hash__(self):
-        return hash(self.name) + hash(tuple(self.args))
+        return self._hash
 
 class Action:
+    __slots__ = ('name', 'args', 'id', 'preconditions', 'positive_effects', 'negative_effects',
+                 'preconditions_mask', 'positive_effects_mask', 'negative_effects_mask', '_hash')
+
     def __init__(self, name, args):
         self.name = name
         self.args = args
+        # Dense index given by RocketDomain.intern_action, -1 until the action is interned
+        self.id = -1
         self.preconditions = set()
         self.positive_effects = set()
         self.negative_effects = set()
+        # Bitsets over proposition ids, filled in by RocketDomain.intern_action
+        self.preconditions_mask = 0
+        self.positive_effects_mask = 0
+        self.negative_effects_mask = 0
+        self._hash = hash(name) + hash(tuple(args))
 
     def __eq__(self, other):
-        return self.name == other.name and self.args == other.args
+        return self is other or (self.name == other.name and self.args == other.args)
     
     def __hash__(self):
-        return hash(self.name) + hash(tuple(self.args))
+        return self._hash
     
     def __repr__(self):
         return self.__str__()
 
+class InterferenceIndex:
+    """
+    For each proposition id, the bitsets of the actions that delete it, need it as a precondition or add it.
+    Two actions interfere (are dependent) when one of them deletes a precondition or a positive effect of the other.
+    """
+    def __init__(self, actions, nb_propositions):
+        self.deleters = [0] * nb_propositions
+        self.consumers = [0] * nb_propositions
+        self.adders = [0] * nb_propositions
+        for action in actions:
+            bit = 1 << action.id
+            for i in bits(action.negative_effects_mask):
+                self.deleters[i] |= bit
+            for i in bits(action.preconditions_mask):
+                self.consumers[i] |= bit
+            for i in bits(action.positive_effects_mask):
+                self.adders[i] |= bit
+        # interfering[action.id] = bitset of the actions interfering with it, filled in lazily
+        self.interfering = {}
+
+    def get_interfering(self, action):
+        """
+        Returns the bitset of the actions that interfere with the given action.
+        :param action: Action object
+        :return: int
+        """
+        mask = self.interfering.get(action.id)
+        if mask is None:
+            mask = 0
+            for i in bits(action.negative_effects_mask):
+                mask |= self.consumers[i] | self.adders[i]
+            for i in bits(action.preconditions_mask | action.positive_effects_mask):
+                mask |= self.deleters[i]
+            self.interfering[action.id] = mask
+        return mask
+
+    def are_interfering(self, action1, action2):
+        return self.get_interfering(action1) >> action2.id & 1 == 1
+
+
 class RocketDomain:
-    def __init__(self, r_fact):
+    def __init__(self, r_fact, r_ops=None):
         self.r_fact = r_fact
+        self.r_ops = r_ops
+        # Interning tables: the id of a proposition (or action) is its index in self.propositions (or self.actions)
+        self.proposition_table = {}
+        self.propositions = []
+        self.actions = []
         self.cargos, self.rockets, self.places, self.init_propositions, self.goal = self.parse_r_fact(r_fact)
-        self.propositions = self.get_propositions(self.cargos, self.rockets, self.places)
-        self.actions = self.get_actions(self.cargos, self.rockets, self.places, self.propositions)
-        # actions_dependencies[(action1, action2)] = True if action1 and action2 are dependent, False otherwise
-        self.actions_dependencies = self.get_actions_dependencies(self.actions)
+        if r_ops is None:
+            self.get_propositions(self.cargos, self.rockets, self.places)
+            self.get_actions(self.cargos, self.rockets, self.places, self.propositions)
+        else:
+            # Only the actions and propositions reachable from the initial state
+            self.get_grounded_actions(r_ops)
+        self.init_mask = self.get_mask(self.init_propositions)
+        self.goal_mask = self.get_mask(self.goal)
+        # Answers whether two actions are dependent without materializing every pair of actions
+        self.interference = InterferenceIndex(self.actions, len(self.propositions))
 
     class MOVE(Action):
+        __slots__ = ()
+
         def __init__(self, name, args):
             super().__init__(name, args)
             assert len(args) == 3
@@ -58,6 +141,8 @@ class RocketDomain:
             return f'[{self.name} {self.args[0]} from {self.args[1]} to {self.args[2]}]'
 
     class LOAD(Action):
+        __slots__ = ()
+
         def __init__(self, name, args):
             super().__init__(name, args)
             assert len(args) == 3
@@ -73,6 +158,8 @@ class RocketDomain:
             return f'[{self.name} {self.args[0]} in {self.args[1]} at {self.args[2]}]'
 
     class UNLOAD(Action):
+        __slots__ = ()
+
         def __init__(self, name, args):
             super().__init__(name, args)
             assert len(args) == 3
@@ -87,7 +174,16 @@ class RocketDomain:
         def __str__(self):
             return f'[{self.name} {self.args[0]} from {self.args[1]} at {self.args[2]}]'
     
+    class OPERATOR(Action):
+        # Action instantiated from an operator schema of a r_ops file
+        __slots__ = ()
+
+        def __str__(self):
+            return f'[{self.name} {" ".join(self.args)}]'
+
     class NOOP(Action):
+        __slots__ = ()
+
         # No-op action that propagates a proposition to the next state
         def __init__(self, name, args):
             super().__init__(name, args)
@@ -122,63 +218,148 @@ class RocketDomain:
         i += 2
         while lines[i] != '\n':
             l = lines[i].replace('(', '').replace(')', '').strip().split()
-            init_propositions.add(Proposition(l[0], l[1:]))
+            init_propositions.add(self.intern_proposition(Proposition(l[0], l[1:])))
             i += 1
         i += 2
         while lines[i] != '\n':
             l = lines[i].replace('(', '').replace(')', '').strip().split()
-            goal.add(Proposition(l[0], l[1:]))
+            goal.add(self.intern_proposition(Proposition(l[0], l[1:])))
             i += 1
         
         return cargos, rockets, places, init_propositions, goal
     
+    def intern_proposition(self, proposition):
+        """
+        Returns the unique instance of the given proposition, giving it the next dense id if it is new.
+        :param proposition: Proposition object
+        :return: Proposition object
+        """
+        interned = self.proposition_table.get(proposition)
+        if interned is None:
+            proposition.id = len(self.propositions)
+            self.propositions.append(proposition)
+            self.proposition_table[proposition] = proposition
+            interned = proposition
+        return interned
+
+    def intern_action(self, action):
+        """
+        Gives the action the next dense id, replaces its propositions by their interned instances and
+        computes the bitsets of its preconditions and effects.
+        :param action: Action object
+        :return: Action object
+        """
+        action.id = len(self.actions)
+        self.actions.append(action)
+        action.preconditions = {self.intern_proposition(prop) for prop in action.preconditions}
+        action.positive_effects = {self.intern_proposition(prop) for prop in action.positive_effects}
+        action.negative_effects = {self.intern_proposition(prop) for prop in action.negative_effects}
+        action.preconditions_mask = self.get_mask(action.preconditions)
+        action.positive_effects_mask = self.get_mask(action.positive_effects)
+        action.negative_effects_mask = self.get_mask(action.negative_effects)
+        return action
+
+    def get_mask(self, propositions):
+        """
+        Returns the bitset of a collection of interned propositions.
+        :param propositions: iterable of Proposition objects
+        :return: int
+        """
+        mask = 0
+        for prop in propositions:
+            mask |= 1 << prop.id
+        return mask
+
+    def propositions_of(self, mask):
+        """
+        Returns the propositions of a bitset, ordered by id.
+        :param mask: int
+        :return: list of Proposition objects
+        """
+        return [self.propositions[i] for i in bits(mask)]
+
+    def actions_of(self, mask):
+        """
+        Returns the actions of a bitset, ordered by id.
+        :param mask: int
+        :return: list of Action objects
+        """
+        return [self.actions[i] for i in bits(mask)]
+
     def get_propositions(self, cargos, rockets, places):
-        propositions = set()
         for cargo in cargos:
             for rocket in rockets:
-                propositions.add(Proposition('in', [cargo, rocket]))
+                self.intern_proposition(Proposition('in', [cargo, rocket]))
             for place in places:
-                propositions.add(Proposition('at', [cargo, place]))
+                self.intern_proposition(Proposition('at', [cargo, place]))
         for rocket in rockets:
-            propositions.add(Proposition('has-fuel', [rocket]))
+            self.intern_proposition(Proposition('has-fuel', [rocket]))
             for place in places:
-                propositions.add(Proposition('at', [rocket, place]))
-        return propositions
+                self.intern_proposition(Proposition('at', [rocket, place]))
+        return self.propositions
 
     def get_actions(self, cargos, rockets, places, propositions):
-        actions = set()
-        for prop in propositions:
-            actions.add(self.NOOP('NOOP', [prop]))
+        for prop in list(propositions):
+            self.intern_action(self.NOOP('NOOP', [prop]))
         for cargo in cargos:
             for rocket in rockets:
                 for place in places:
-                    actions.add(self.LOAD('LOAD', [cargo, rocket, place]))
-                    actions.add(self.UNLOAD('UNLOAD', [cargo, rocket, place]))
+                    self.intern_action(self.LOAD('LOAD', [cargo, rocket, place]))
+                    self.intern_action(self.UNLOAD('UNLOAD', [cargo, rocket, place]))
         for rocket in rockets:
             for place1 in places:
                 for place2 in places:
                     if place1 != place2:
-                        actions.add(self.MOVE('MOVE', [rocket, place1, place2]))
-        return actions
-    
-    def are_independent(self, action1, action2):
-        for n in action1.negative_effects:
-            if n in action2.preconditions or n in action2.positive_effects:
-                return False
-        for n in action2.negative_effects:
-            if n in action1.preconditions or n in action1.positive_effects:
-                return False
-        return True
+                        self.intern_action(self.MOVE('MOVE', [rocket, place1, place2]))
+        return self.actions
     
-    def get_actions_dependencies(self, actions):
+    def get_grounded_actions(self, r_ops):
         """
-        Returns a dictionary of dependencies between actions, where the key is a tuple of actions and the value is a boolean
-        being True if the actions are dependent and False otherwise.
-        :param actions: list of Action objects
-        :return: dict
+        Instantiates the operators of the r_ops file that are relaxed-reachable from the initial state, with a No-op action
+        for each reachable proposition.
+        :param r_ops: path of the r_ops file
+        :return: list of Action objects
         """
-        dependencies = {(action1, action2): (not self.are_independent(action1, action2)) for action1 in actions for action2 in actions}
-        return dependencies
+        objects = {'CARGO': self.cargos, 'ROCKET': self.rockets, 'PLACE': self.places}
+        init_facts = [(prop.name, tuple(prop.args)) for prop in sorted(self.init_propositions, key=lambda prop: prop.id)]
+        facts, ground_actions = ground(parse_operators(r_ops), objects, init_facts)
+        for name, args in facts:
+            self.intern_action(self.NOOP('NOOP', [self.intern_proposition(Proposition(name, list(args)))]))
+        for name, args, preconditions, positive_effects, negative_effects in ground_actions:
+            action = self.OPERATOR(name, list(args))
+            action.preconditions.update(Proposition(predicate, list(fact_args)) for predicate, fact_args in preconditions)
+            action.positive_effects.update(Proposition(predicate, list(fact_args)) for predicate, fact_args in positive_effects)
+            action.negative_effects.update(Proposition(predicate, list(fact_args)) for predicate, fact_args in negative_effects)
+            self.intern_action(action)
+        return self.actions
+
+    def get_relevance(self, goal):
+        """
+        Returns the actions and propositions that are relevant to a goal, by a backward pass from the goal: an action is relevant
+        if it adds a relevant proposition, and the preconditions of a relevant action are relevant.
+        An action that is not relevant can never be part of a plan for the goal.
+        :param goal: bitset of propositions
+        :return: bitset of actions, bitset of propositions
+        """
+        relevant_actions = 0
+        relevant_propositions = goal
+        frontier = goal
+        while frontier:
+            new_actions = 0
+            for prop_id in bits(frontier):
+                new_actions |= self.interference.adders[prop_id]
+            new_actions &= ~relevant_actions
+            relevant_actions |= new_actions
+            frontier = 0
+            for action_id in bits(new_actions):
+                frontier |= self.actions[action_id].preconditions_mask
+            frontier &= ~relevant_propositions
+            relevant_propositions |= frontier
+        return relevant_actions, relevant_propositions
+
+    def are_independent(self, action1, action2):
+        return not (action1.negative_effects_mask & (action2.preconditions_mask | action2.positive_effects_mask)
+                    or action2.negative_effects_mask & (action1.preconditions_mask | action1.positive_effects_mask))
 
 
 if __name__ == '__main__':
@@ -191,8 +372,8 @@ if __name__ == '__main__':
     print(f'Initial propositions:\n{domain.init_propositions}\n')
     print(f'Goals:\n{domain.goal}\n')
     # print(f'\nActions:\n{domain.actions}\n\n')
-    print(f'Number of actions (excluding No-op): {len(domain.actions)}\n')
-    print(f'Dependency table size: {len(domain.actions_dependencies)}')
+    print(f'Number of actions (including No-op): {len(domain.actions)}\n')
+    print(f'Interference index size: {len(domain.interference.deleters)} propositions')
 
     # Test sets of actions and propositions and operations on them
     domain = RocketDomain('examples/r_fact2.txt')
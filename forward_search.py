@@ -0,0 +1,101 @@
+import heapq
+import itertools
+
+from heuristics import RelaxedHeuristic
+
+
+class ForwardSearch:
+    """
+    Forward state-space search from the initial state, guided by a relaxed planning graph heuristic.
+    States are bitsets of propositions. With weight None the search is a greedy best-first search (nodes ordered by heuristic
+    value, then by cost), otherwise a weighted A* ordering nodes by cost + weight * heuristic (A* with weight 1 and an
+    admissible heuristic such as 'max' finds a shortest sequential plan).
+    The optional Budget object is checked at each expanded state.
+    """
+    def __init__(self, rd, heuristic='ff', weight=None, stats=None, budget=None):
+        self.rd = rd
+        self.heuristic = RelaxedHeuristic(rd, heuristic)
+        self.weight = weight
+        self.stats = stats
+        self.budget = budget
+        self.actions = [action for action in rd.actions if action.name != 'NOOP']
+        self.expanded = 0
+
+    def get_successors(self, state):
+        for action in self.actions:
+            if not action.preconditions_mask & ~state:
+                yield action, state & ~action.negative_effects_mask | action.positive_effects_mask
+
+    def search(self, init, goal):
+        """
+        Returns a sequential plan (list of Action objects) from the init state to a state including the goal, or None.
+        :param init: bitset of propositions
+        :param goal: bitset of propositions
+        :return: list of Action objects or None
+        """
+        h = self.heuristic(init, goal)
+        if h is None:
+            return None
+        counter = itertools.count()
+        heap = [(self.priority(0, h), next(counter), init)]
+        costs = {init: 0}
+        parents = {init: None}
+        closed = set()
+        while heap:
+            _, _, state = heapq.heappop(heap)
+            if state in closed:
+                continue
+            if not goal & ~state:
+                return self.get_plan(parents, state)
+            closed.add(state)
+            if self.budget is not None:
+                self.budget.check(node=True)
+            self.expanded += 1
+            if self.stats is not None:
+                self.stats.nodes[0] += 1
+            cost = costs[state] + 1
+            for action, successor in self.get_successors(state):
+                if successor in closed or cost >= costs.get(successor, cost + 1):
+                    continue
+                h = self.heuristic(successor, goal)
+                if h is None:
+                    continue
+                costs[successor] = cost
+                parents[successor] = (state, action)
+                heapq.heappush(heap, (self.priority(cost, h), next(counter), successor))
+        return None
+
+    def priority(self, cost, h):
+        if self.weight is None:
+            return h, cost
+        return cost + self.weight * h, h
+
+    def get_plan(self, parents, state):
+        plan = []
+        while parents[state] is not None:
+            state, action = parents[state]
+            plan.append(action)
+        plan.reverse()
+        return plan
+
+    def get_layered_plan(self, plan):
+        """
+        Turns a sequential plan into a layered plan: each action goes in the layer after the last earlier action it depends
+        on (one of its preconditions is added by that action) or interferes with, so independent actions share a layer.
+        :param plan: list of Action objects
+        :return: list of sets of Action objects
+        """
+        layered_plan = []
+        layer_of = []
+        for k, action in enumerate(plan):
+            layer = 0
+            for j in range(k):
+                previous = plan[j]
+                if previous.positive_effects_mask & action.preconditions_mask \
+                        or self.rd.interference.are_interfering(previous, action):
+                    layer = max(layer, layer_of[j] + 1)
+            layer_of.append(layer)
+            if layer == len(layered_plan):
+                layered_plan.append(set())
+            layered_plan[layer].add(action)
+        return layered_plan
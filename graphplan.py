@@ -1,23 +1,198 @@
-from domain import RocketDomain
+import random
+import time
+
+from budget import BudgetExhausted, SolveResult
+from domain import RocketDomain, bits
+from forward_search import ForwardSearch
+from nogood import NogoodStore
+from sat_encoding import GraphEncoding
+from symmetry import Symmetry
+from tracing import FULL, LAYER, OFF, SUMMARY, TraceSink
+
+
+def add_pair(partners, id1, id2):
+    """
+    Records a symmetric pair in a map from ids to the bitset of their partners.
+    :param partners: dict
+    :param id1: int
+    :param id2: int
+    """
+    partners[id1] = partners.get(id1, 0) | 1 << id2
+    partners[id2] = partners.get(id2, 0) | 1 << id1
+
+
+def iter_pairs(partners):
+    """
+    Yields each pair of a map from ids to the bitset of their partners once, as (smaller id, greater id).
+    :param partners: dict
+    :return: generator of tuples of int
+    """
+    for id1, mask in partners.items():
+        for id2 in bits(mask >> id1 + 1 << id1 + 1):
+            yield id1, id2
+
+
+class DeltaMap:
+    """
+    Map from ids to bitsets, stored as the entries that changed since a parent map.
+    An entry set to 0 hides the entry of the parent.
+    Once the map is complete, freeze caches its entries in a flat dict, so lookups do not walk the chain of parents.
+    """
+    __slots__ = ('parent', 'changes', 'flat')
+
+    def __init__(self, parent=None, changes=None):
+        self.parent = parent
+        self.changes = changes if changes is not None else {}
+        self.flat = None
+
+    @classmethod
+    def from_dict(cls, parent, partners):
+        """
+        Returns a DeltaMap with the same entries as the given dict, stored as the differences with the parent.
+        :param parent: DeltaMap object
+        :param partners: dict
+        :return: DeltaMap object
+        """
+        changes = {key: value for key, value in partners.items() if parent.get(key) != value}
+        for key in parent.materialize():
+            if key not in partners:
+                changes[key] = 0
+        return cls(parent, changes)
+
+    def get(self, key, default=0):
+        if self.flat is not None:
+            return self.flat.get(key, default)
+        node = self
+        while node is not None:
+            if node.flat is not None:
+                return node.flat.get(key, default)
+            value = node.changes.get(key)
+            if value is not None:
+                return value
+            node = node.parent
+        return default
+
+    def materialize(self):
+        """
+        Returns the entries of the map as a dict.
+        :return: dict
+        """
+        chain = []
+        node = self
+        while node is not None and node.flat is None:
+            chain.append(node.changes)
+            node = node.parent
+        partners = {} if node is None else dict(node.flat)
+        for changes in reversed(chain):
+            partners.update(changes)
+        return {key: value for key, value in partners.items() if value}
+
+    def freeze(self):
+        """
+        Caches the entries of the map, which must not change anymore.
+        """
+        self.flat = self.materialize()
+
+    def items(self):
+        if self.flat is not None:
+            return self.flat.items()
+        return self.materialize().items()
+
+    def released(self):
+        """
+        Returns the bitset of the ids that belong to a pair of the parent that is not in this map anymore.
+        :return: int
+        """
+        released = 0
+        if self.parent is None:
+            return released
+        for key, value in self.changes.items():
+            dropped = self.parent.get(key) & ~value
+            if dropped:
+                released |= dropped | 1 << key
+        return released
 
 
 class GraphPlan:
-    def __init__(self, r_fact):
-        self.rd = RocketDomain(r_fact)
+    def __init__(self, r_fact, r_ops=None, incremental=True, relevance=False, trace_level=OFF, trace_file=None, trace_stream=None,
+                 stats=None, engine='graphplan', heuristic='ff', weight=None, symmetry=False, extraction='iterative',
+                 mutex_backend='python', seed=None, nogood='subset'):
+        # With a r_ops file, only the actions reachable from the initial state are grounded from its operators
+        self.rd = RocketDomain(r_fact, r_ops)
+        # If True, each layer's mutexes are derived from the previous layer's instead of being recomputed from scratch
+        self.incremental = incremental
+        # With mutex_backend='numpy', layers are computed with boolean matrix products instead (see numpy_mutex.py)
+        if mutex_backend not in ('python', 'numpy'):
+            raise ValueError(f'Unknown mutex backend {mutex_backend}, expected python or numpy')
+        self.matrix_mutexes = None
+        if mutex_backend == 'numpy':
+            from numpy_mutex import MatrixMutexes
+            self.matrix_mutexes = MatrixMutexes(self.rd)
         self.layers = [self.get_initial_layer(self.rd)]
-        # a list of k sets (one for each layer) of frozen subsets of goal propositions that lead to failure
-        self.nogood =[set()]
-        self.trace = ''
+        # Level costs used to order the extraction, memoized for the graph: first layer in which each proposition appears
+        # (-1 while it is not in the graph) and sum of the levels of the preconditions of each action id
+        self.proposition_levels = [-1] * len(self.rd.propositions)
+        self.set_levels(self.rd.init_mask, 0)
+        self.action_costs = {}
+        # With a seed, ties between subgoals and between providers are broken in a random order instead of by id
+        if seed is None:
+            self.proposition_ranks = range(len(self.rd.propositions))
+            self.action_ranks = range(len(self.rd.actions))
+        else:
+            generator = random.Random(seed)
+            self.proposition_ranks = generator.sample(range(len(self.rd.propositions)), len(self.rd.propositions))
+            self.action_ranks = generator.sample(range(len(self.rd.actions)), len(self.rd.actions))
+        self.trace = TraceSink(trace_level, trace_file or f'trace_{r_fact.split("/")[-1]}', trace_stream)
+        # SolverStats object, or None to disable the counters and timers
+        self.stats = stats
+        # Bitset of the actions the graph can contain: with relevance, only the actions that can help achieve the goal
+        self.allowed_actions = (1 << len(self.rd.actions)) - 1
+        self.pruned_actions = self.pruned_propositions = 0
+        if relevance:
+            self.allowed_actions, relevant_propositions = self.rd.get_relevance(self.rd.goal_mask)
+            self.pruned_actions = len(self.rd.actions) - self.allowed_actions.bit_count()
+            self.pruned_propositions = len(self.rd.propositions) - relevant_propositions.bit_count()
+            if self.stats is not None:
+                self.stats.pruned_actions, self.stats.pruned_propositions = self.pruned_actions, self.pruned_propositions
+        # With symmetry, interchangeable objects are detected to canonicalize the nogoods and prune symmetric providers,
+        # among the actions the graph can contain
+        self.symmetry = Symmetry(self.rd, self.allowed_actions) if symmetry else None
+        # goals (bitsets of propositions) that lead to failure, for each layer, looked up by subset ('subset') or only
+        # by equality ('exact')
+        if nogood not in ('subset', 'exact'):
+            raise ValueError(f'Unknown nogood strategy {nogood}, expected subset or exact')
+        self.nogood = NogoodStore(None if self.symmetry is None else self.symmetry.canonicalize, nogood == 'subset')
+        # 'graphplan' extracts the plan backward from the graph, 'forward' searches it forward from the initial state with
+        # a relaxed planning graph heuristic ('max', 'add' or 'ff'), greedily (weight None) or with weighted A*, and 'sat'
+        # encodes the layers of the graph in CNF for the built-in CDCL solver
+        if engine not in ('graphplan', 'forward', 'sat'):
+            raise ValueError(f'Unknown engine {engine}, expected graphplan, forward or sat')
+        self.engine = engine
+        # Backward extraction: 'iterative' (explicit stack, see iterative_extract) or 'recursive' (extract and gp_search),
+        # which is always used with the FULL trace since it writes the backtracking steps
+        if extraction not in ('iterative', 'recursive'):
+            raise ValueError(f'Unknown extraction {extraction}, expected iterative or recursive')
+        self.extraction = extraction
+        # Budget object of the running solve (see solve), or None for no limit
+        self.budget = None
+        self.heuristic = heuristic
+        self.weight = weight
 
     class Layer:
         def __init__(self):
-            self.actions = set()
-            self.propositions = set()
-            self.mutex_actions = set()
-            self.mutex_propositions = set()
-            self.preconditions_links = set()
-            self.positive_effects_links = set()
-            self.negative_effects_links = set()
+            # Bitsets over action and proposition ids (see RocketDomain.actions_of and RocketDomain.propositions_of)
+            self.actions = 0
+            self.propositions = 0
+            # Actions and propositions that were not in the previous layer
+            self.added_actions = 0
+            self.added_propositions = 0
+            # Maps from an action (or proposition) id to the bitset of the actions (or propositions) it is mutex with,
+            # built as differences with the maps of the previous layer and frozen once the layer is complete
+            self.mutex_actions = DeltaMap()
+            self.mutex_propositions = DeltaMap()
+            # Number of pairs passed to are_mutex_actions and are_mutex_propositions when the layer was built
+            self.rechecked_action_pairs = 0
+            self.rechecked_proposition_pairs = 0
 
     def get_initial_layer(self, rd):
         """
@@ -26,314 +201,731 @@ class GraphPlan:
         :return: Layer object
         """
         initial_layer = self.Layer()
-        initial_layer.propositions = rd.init_propositions
+        initial_layer.propositions = rd.init_mask
+        initial_layer.added_propositions = rd.init_mask
         # No mutex propositions in the initial layer since all propositions are known to be true at the start
-        initial_layer.mutex_propositions = set()
+        initial_layer.mutex_propositions = DeltaMap()
+        initial_layer.mutex_actions.freeze()
+        initial_layer.mutex_propositions.freeze()
         return initial_layer
 
     def expand(self):
         """
         Adds a layer to the planning graph.
+        Once the graph has leveled off, the new layer is the previous layer object itself.
         """
+        if self.budget is not None:
+            self.budget.check()
+        previous_layer = self.layers[-1]
+        if self.fixed_point():
+            self.layers.append(previous_layer)
+            self.nogood.add_layer()
+            if self.stats is not None:
+                self.stats.add_layer()
+                self.stats.emit('layer')
+            if self.trace.level >= LAYER:
+                self.trace.write(f'Expanding the graph, layer {len(self.layers) - 1} is identical to layer {len(self.layers) - 2}\n'
+                                 '\n################################################################################\n\n')
+            return
+        if self.stats is not None:
+            start = time.perf_counter()
         new_layer = self.Layer()
-        new_layer.actions = self.get_next_actions(self.layers[-1].propositions, self.layers[-1].mutex_propositions)
-        new_layer.mutex_actions = self.get_mutex_actions(new_layer.actions, self.layers[-1].mutex_propositions)
-        new_layer.propositions = self.get_next_propositions(new_layer.actions)
-        new_layer.mutex_propositions = self.get_mutex_propositions(new_layer.propositions, new_layer.actions, new_layer.mutex_actions)
+        if self.matrix_mutexes is not None:
+            new_layer.actions, mutex_actions, mutex_propositions = self.matrix_mutexes.expand(
+                previous_layer.propositions, previous_layer.mutex_propositions, self.allowed_actions)
+        elif self.incremental:
+            # Actions of the previous layer are still applicable, only the others have to be checked
+            new_layer.actions = previous_layer.actions | self.get_next_actions(previous_layer.propositions, previous_layer.mutex_propositions, previous_layer.actions)
+        else:
+            new_layer.actions = self.get_next_actions(previous_layer.propositions, previous_layer.mutex_propositions)
+        actions = self.rd.actions_of(new_layer.actions)
+        new_layer.propositions = self.get_next_propositions(actions)
+        propositions = self.rd.propositions_of(new_layer.propositions)
+        new_layer.added_actions = new_layer.actions & ~previous_layer.actions
+        new_layer.added_propositions = new_layer.propositions & ~previous_layer.propositions
+        if self.matrix_mutexes is not None:
+            new_layer.mutex_actions = DeltaMap.from_dict(previous_layer.mutex_actions, mutex_actions)
+            new_layer.rechecked_action_pairs = len(actions) ** 2
+            new_layer.rechecked_proposition_pairs = len(propositions) ** 2
+        elif self.incremental:
+            # Propositions that lost a mutex between the two previous proposition layers
+            released_propositions = previous_layer.mutex_propositions.released()
+            mutex_actions, new_layer.rechecked_action_pairs = self.update_mutex_actions(
+                actions, previous_layer, previous_layer.mutex_propositions, released_propositions)
+            new_layer.mutex_actions = DeltaMap.from_dict(previous_layer.mutex_actions, mutex_actions)
+            # Propositions that gained a producer or whose producers lost a mutex
+            touched_propositions = self.get_next_propositions(self.rd.actions_of(new_layer.added_actions))
+            touched_propositions |= self.get_next_propositions(self.rd.actions_of(new_layer.mutex_actions.released()))
+            mutex_propositions, new_layer.rechecked_proposition_pairs = self.update_mutex_propositions(
+                propositions, new_layer.actions, new_layer.mutex_actions, previous_layer, touched_propositions)
+        else:
+            mutex_actions = self.get_mutex_actions(actions, previous_layer.mutex_propositions)
+            new_layer.mutex_actions = DeltaMap.from_dict(previous_layer.mutex_actions, mutex_actions)
+            mutex_propositions = self.get_mutex_propositions(propositions, new_layer.actions, new_layer.mutex_actions)
+            new_layer.rechecked_action_pairs = len(actions) ** 2
+            new_layer.rechecked_proposition_pairs = len(propositions) ** 2
+        new_layer.mutex_propositions = DeltaMap.from_dict(previous_layer.mutex_propositions, mutex_propositions)
+        new_layer.mutex_actions.freeze()
+        new_layer.mutex_propositions.freeze()
 
         #### Trace ####
-        self.trace += f'Expanding the graph, building layer {len(self.layers)}\n'
-        self.trace += f'\tLayer {len(self.layers)} actions:\n'
-        for action in new_layer.actions:
-            self.trace += f'\t\t{action}\n'
-        self.trace += f'\tLayer {len(self.layers)} mutex actions:\n'
-        for ma1, ma2 in new_layer.mutex_actions:
-            self.trace += f'\t\t{ma1} and {ma2}\n'
-        self.trace += f'\tLayer {len(self.layers)} propositions:\n'
-        for prop in new_layer.propositions:
-            self.trace += f'\t\t{prop}\n'
-        self.trace += f'\tLayer {len(self.layers)} mutex propositions:\n'
-        for mp1, mp2 in new_layer.mutex_propositions:
-            self.trace += f'\t\t{mp1} and {mp2}\n'
-        self.trace += '\n################################################################################\n\n'
+        if self.trace.level >= LAYER:
+            write = self.trace.write
+            write(f'Expanding the graph, building layer {len(self.layers)}\n')
+            write(f'\tLayer {len(self.layers)} actions:\n')
+            for action in actions:
+                write(f'\t\t{action}\n')
+            write(f'\tLayer {len(self.layers)} mutex actions:\n')
+            for ma1, ma2 in iter_pairs(mutex_actions):
+                write(f'\t\t{self.rd.actions[ma1]} and {self.rd.actions[ma2]}\n')
+            write(f'\tLayer {len(self.layers)} propositions:\n')
+            for prop in propositions:
+                write(f'\t\t{prop}\n')
+            write(f'\tLayer {len(self.layers)} mutex propositions:\n')
+            for mp1, mp2 in iter_pairs(mutex_propositions):
+                write(f'\t\t{self.rd.propositions[mp1]} and {self.rd.propositions[mp2]}\n')
+            write(f'\tLayer {len(self.layers)} rechecked pairs: {new_layer.rechecked_action_pairs} action pairs, '
+                  f'{new_layer.rechecked_proposition_pairs} proposition pairs\n')
+            write('\n################################################################################\n\n')
         ##############
 
-        for action in new_layer.actions:
-            for prop in action.preconditions:
-                if prop in self.layers[-1].propositions:
-                    new_layer.preconditions_links.add((prop, action))
-            for prop in action.positive_effects:
-                if prop in new_layer.propositions:
-                    new_layer.positive_effects_links.add((action, prop))
-            for prop in action.negative_effects:
-                if prop in new_layer.propositions:
-                    new_layer.negative_effects_links.add((action, prop))
         self.layers.append(new_layer)
-        self.nogood.append(set())
+        self.set_levels(new_layer.added_propositions, len(self.layers) - 1)
+        self.nogood.add_layer()
+        if self.stats is not None:
+            self.stats.add_layer()
+            self.stats.expand_time[-1] = time.perf_counter() - start
+            self.stats.mutex_checks[-1] = new_layer.rechecked_action_pairs + new_layer.rechecked_proposition_pairs
+            self.stats.emit('layer')
 
     def extract(self, goal, i):
         """
         Checks if the goal has already been proven to be unreachable, and maintains the nogood sets.
-        :param goal: a set of Proposition objects
+        :param goal: a bitset of propositions
         :param i: the layer index
         :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
         """
-        self.trace += '################################################################################\n\n'
-        self.trace += f'Trying to extract the following goal from layer {i}:\n'
-        for prop in goal:
-            self.trace += f'\t{prop}\n'
-        self.trace += '\n'
+        if self.trace.level >= FULL:
+            self.trace.write('################################################################################\n\n'
+                             f'Trying to extract the following goal from layer {i}:\n'
+                             + ''.join(f'\t{prop}\n' for prop in self.rd.propositions_of(goal)) + '\n')
         if i == 0:
             # A global plan has been found
-            self.trace += '\n#####################################################################################################################\n'
-            self.trace += '### The intermediate goal for layer 0 corresponds to the initial preconditions, the built layered plan is valid ! ###\n'
-            self.trace += '######################## We can now concatenate the plans for each layer and end the search. ########################\n'
-            self.trace += '#####################################################################################################################\n\n'
+            if self.trace.level >= FULL:
+                self.trace.write('\n#####################################################################################################################\n'
+                                 '### The intermediate goal for layer 0 corresponds to the initial preconditions, the built layered plan is valid ! ###\n'
+                                 '######################## We can now concatenate the plans for each layer and end the search. ########################\n'
+                                 '#####################################################################################################################\n\n')
             return []
-        if goal in self.nogood[i]:
-            # This goal was already proven to be unreachable
+        if self.nogood.is_nogood(goal, i):
+            # This goal, or a subset of it, was already proven to be unreachable
             return None
-        layered_plan = self.gp_search(goal, set(), i)
+        layered_plan = self.gp_search(goal, set(), i, 0)
         if layered_plan is not None:
             return layered_plan
         # We found an unreachable goal, add it to the nogood set
-        self.nogood[i].add(frozenset(goal))
+        self.nogood.add(goal, i)
         return None
         
-    def gp_search(self, goal, plan, i, pad=0):
+    def gp_search(self, goal, plan, i, blocked, pad=0):
         """
         Builds a plan for the given goal in the given layer.
-        :param goal: a set of Proposition objects
+        :param goal: a bitset of propositions
         :param plan: a set of Action objects
         :param i: the layer index
+        :param blocked: bitset of the actions of the layer that are mutex with an action of the plan
         :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
         """
-        if len(goal) == 0:
+        if self.budget is not None:
+            self.budget.check(node=True)
+        if self.stats is not None:
+            self.stats.nodes[i] += 1
+        if not goal:
             # We found a valid plan that achieves the goal for the current layer
-            next_preconditions = set()
+            next_preconditions = 0
             for action in plan:
-                next_preconditions.update(action.preconditions)
+                next_preconditions |= action.preconditions_mask
             
             next_layered_plan = self.extract(next_preconditions, i - 1)
             if next_layered_plan is None:
                 return None
             
             #### Trace ####
-            self.trace += f'The valid intermediate goal that was extracted from layer {i - 1} is:\n'
-            for prop in next_preconditions:
-                self.trace += f'\t{prop}\n'
-            self.trace += f'\nThe valid corresponding plan for layer {i} is:\n'
-            for action in plan:
-                self.trace += f'\t{action}\n'
-            self.trace += '\n################################################################################\n\n'
+            if self.trace.level >= FULL:
+                self.trace.write(f'The valid intermediate goal that was extracted from layer {i - 1} is:\n'
+                                 + ''.join(f'\t{prop}\n' for prop in self.rd.propositions_of(next_preconditions))
+                                 + f'\nThe valid corresponding plan for layer {i} is:\n'
+                                 + ''.join(f'\t{action}\n' for action in plan)
+                                 + '\n################################################################################\n\n')
             ##############
             
             return next_layered_plan + [plan]
 
-        # Or is it a for loop ?
-        prop = goal.pop()
-        goal.add(prop)
-        self.trace += '\t' * pad
-        self.trace += f'\t\tLooking for an action that can provide {prop} in layer {i}\n'
-        providers = self.get_providers(prop, self.layers[i].actions, self.layers[i].positive_effects_links, plan, self.layers[i].mutex_actions)
-        self.trace += '\t' * pad
-        self.trace += f'\t\t\tProviders for {prop} in layer {i}:\n'
-        for action in providers:
-            self.trace += '\t' * pad
-            self.trace += f'\t\t\t\t{action}\n'
+        layer = self.layers[i]
+        prop = self.choose_subgoal(goal, layer, blocked)
+        providers = self.get_providers(prop, layer, plan, goal, blocked)
+        if self.trace.level >= FULL:
+            indent = '\t' * pad
+            self.trace.write(f'{indent}\t\tLooking for an action that can provide {prop} in layer {i}\n'
+                             f'{indent}\t\t\tProviders for {prop} in layer {i}:\n'
+                             + ''.join(f'{indent}\t\t\t\t{action}\n' for action in providers))
+            if len(providers) == 0:
+                self.trace.write(f'{indent}\t\t\t\tNo provider found, choosing another provider for the previous proposition\n')
         if len(providers) == 0:
-            self.trace += '\t' * pad
-            self.trace += '\t\t\t\tNo provider found, choosing another provider for the previous proposition\n'
             return None
         for action in providers:
-            self.trace += '\n'
-            self.trace += '\t' * pad
-            self.trace += f'\t\t\tTrying to add {action} to the plan\n\n'
+            if self.trace.level >= FULL:
+                self.trace.write(f'\n{indent}\t\t\tTrying to add {action} to the plan\n\n')
             new_plan = plan.copy()
             new_plan.add(action)
-            new_goal = goal - action.positive_effects
-            layered_plan = self.gp_search(new_goal, new_plan, i, pad + 1)
+            new_goal = goal & ~action.positive_effects_mask
+            new_blocked = blocked | layer.mutex_actions.get(action.id, 0)
+            layered_plan = self.gp_search(new_goal, new_plan, i, new_blocked, pad + 1)
             if layered_plan is not None:
                 return layered_plan
+            if self.stats is not None:
+                self.stats.backtracks[i] += 1
         return None
     
-    def graphplan(self):
+    def iterative_extract(self, goal, i):
+        """
+        Same search as extract, without recursion: the search nodes of gp_search are frames of an explicit stack, and the
+        actions chosen in each layer, and the actions they block, are pushed on a trail that is popped on backtrack instead of
+        copying the plan.
+        The subgoals, providers, nogoods and counters are the same as with extract, so the same plan is found.
+        :param goal: a bitset of propositions
+        :param i: the layer index
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        if i == 0:
+            return []
+        if self.nogood.is_nogood(goal, i):
+            return None
+        # plans[j] = actions chosen so far in layer j, goals[j] = goal being extracted from layer j
+        plans = [[] for _ in range(i + 1)]
+        # blocked[j][-1] = bitset of the actions of layer j that are mutex with an action of plans[j]
+        blocked = [[0] for _ in range(i + 1)]
+        goals = [0] * (i + 1)
+        goals[i] = goal
+        # Frames [j, goal, providers, index of the next provider] of the gp_search nodes, and layer indexes marking the
+        # start of the extraction of goals[j] from layer j
+        stack = [i]
+        j = i
+        current = goal
+        visit = True
+        while True:
+            if visit:
+                # Node of gp_search for the goal current in layer j
+                if self.budget is not None:
+                    self.budget.check(node=True)
+                if self.stats is not None:
+                    self.stats.nodes[j] += 1
+                visit = False
+                if not current:
+                    next_preconditions = 0
+                    for action in plans[j]:
+                        next_preconditions |= action.preconditions_mask
+                    if j == 1:
+                        return [set(plan) for plan in plans[1:]]
+                    if not self.nogood.is_nogood(next_preconditions, j - 1):
+                        j -= 1
+                        goals[j] = current = next_preconditions
+                        stack.append(j)
+                        visit = True
+                    continue
+                prop = self.choose_subgoal(current, self.layers[j], blocked[j][-1])
+                providers = self.get_providers(prop, self.layers[j], plans[j], current, blocked[j][-1])
+                if providers:
+                    stack.append([j, current, providers, 0])
+            # Returning to the frame on top of the stack, after its last attempt failed (or before its first attempt)
+            frame = stack[-1]
+            if isinstance(frame, int):
+                # Every plan for goals[frame] in layer frame failed
+                stack.pop()
+                self.nogood.add(goals[frame], frame)
+                if not stack:
+                    return None
+                continue
+            j, current, providers, k = frame
+            if k > 0:
+                plans[j].pop()
+                blocked[j].pop()
+                if self.stats is not None:
+                    self.stats.backtracks[j] += 1
+            if k == len(providers):
+                stack.pop()
+                continue
+            action = providers[k]
+            frame[3] = k + 1
+            plans[j].append(action)
+            blocked[j].append(blocked[j][-1] | self.layers[j].mutex_actions.get(action.id, 0))
+            current &= ~action.positive_effects_mask
+            visit = True
+
+    def graphplan(self, goal=None):
+        """
+        Returns a layered plan for the goal, the goal of the r_fact file by default.
+        The graph is only expanded as needed, so the method can be called again for other goals on the same graph.
+        :param goal: a bitset of propositions or None
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        if goal is None:
+            goal = self.rd.goal_mask
+        if not self.expand_until_reachable(goal):
+            layered_plan = None
+        elif self.engine == 'forward':
+            layered_plan = self.forward_plan(goal)
+        elif self.engine == 'sat':
+            layered_plan = self.sat_plan(goal)
+        else:
+            layered_plan = self.extract_plan(goal)
+        if self.stats is not None:
+            self.stats.emit('done')
+        return layered_plan
+
+    def solve(self, goal=None, budget=None):
+        """
+        Runs graphplan within a budget and returns a SolveResult: solved, no-plan, or budget-exhausted with what was
+        built so far (the graph, the nogoods and the stats are kept, so the solve can be resumed with a new budget).
+        :param goal: a bitset of propositions or None (see graphplan)
+        :param budget: Budget object or None for no limit
+        :return: SolveResult object
+        """
+        start = time.perf_counter()
+        self.budget = budget
+        if budget is not None:
+            budget.start()
+        try:
+            layered_plan = self.graphplan(goal)
+        except BudgetExhausted as e:
+            if self.trace.level >= SUMMARY:
+                self.trace.write(f'Search stopped: {e}\n')
+            if self.stats is not None:
+                self.stats.emit('done')
+            return SolveResult('budget-exhausted', reason=e.reason, stats=self.stats, layers=len(self.layers),
+                               nodes=budget.nodes, wall_time=time.perf_counter() - start)
+        finally:
+            self.budget = None
+        return SolveResult('no-plan' if layered_plan is None else 'solved', layered_plan, stats=self.stats,
+                           layers=len(self.layers), nodes=0 if budget is None else budget.nodes,
+                           wall_time=time.perf_counter() - start)
+
+    def expand_until_reachable(self, goal):
+        """
+        Expands the graph until the goal is included in the last layer without mutexes, or until the graph levels off.
+        :param goal: a bitset of propositions
+        :return: boolean, True if a plan might exist from the last layer
+        """
+        if self.trace.level >= SUMMARY:
+            self.trace.write('#################################################################################\n'
+                             '### Expanding the planning graph until the goal is included in the last layer ###\n'
+                             '#################################################################################\n\n')
+            if self.symmetry is not None:
+                self.trace.write('Symmetric objects: ' + (', '.join('{' + ', '.join(group) + '}' for group in self.symmetry.groups)
+                                                           or 'none') + '\n\n')
+            if self.pruned_actions:
+                self.trace.write(f'Relevance analysis pruned {self.pruned_actions} of {len(self.rd.actions)} actions '
+                                 f'and {self.pruned_propositions} of {len(self.rd.propositions)} propositions\n\n')
+        i = self.get_first_layer(goal)
+        while self.continue_search(goal, i) and not self.fixed_point(i):
+            self.expand()
+            i += 1
+        if self.trace.level >= SUMMARY:
+            self.trace.write('##############################################################################################\n'
+                             f'### A valid plan might exist from layer {i}, we can try to extract the goal from this layer. ###\n'
+                             '##############################################################################################\n\n')
+        # If the goal is still not reachable, we stopped expanding the graph because we reached the fixed point
+        return not self.continue_search(goal, i)
+
+    def get_first_layer(self, goal):
+        """
+        Returns the index of the first layer of the graph that includes the goal without mutexes, or of the last layer.
+        The graph can already be longer than needed when it is reused for several goals.
+        :param goal: a bitset of propositions
+        :return: int
+        """
         i = 0
-        goal = self.rd.goal.copy()
-        self.trace += '#################################################################################\n'
-        self.trace += '### Expanding the planning graph until the goal is included in the last layer ###\n'
-        self.trace += '#################################################################################\n\n'
-        while self.continue_search(goal) and not self.fixed_point():
+        while i < len(self.layers) - 1 and self.continue_search(goal, i):
             i += 1
-            self.expand()
-        self.trace += '##############################################################################################\n'
-        self.trace += f'### A valid plan might exist from layer {i}, we can try to extract the goal from this layer. ###\n'
-        self.trace += '##############################################################################################\n\n'
-        if self.continue_search(goal):
-            # We stopped expanding the graph because we reached the fixed point and the goal is not yet achieved
-            return None
-        nogood_size = len(self.nogood[-1]) if self.fixed_point() else 0
+        return i
 
-        layered_plan = self.extract(goal, i)
+    def extract_plan(self, goal):
+        """
+        Extracts a plan for the goal from the first layer that includes it without mutexes, going to the next layers (and
+        expanding the graph when needed) until a plan is found or proven not to exist.
+        :param goal: a bitset of propositions
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        i = self.get_first_layer(goal)
+        nogood_size = self.nogood.size(i) if self.fixed_point(i) else 0
+
+        layered_plan = self.timed_extract(goal, i)
         while layered_plan is None:
             i += 1
-            self.expand()
-            layered_plan = self.extract(goal, i)
-            if layered_plan is None and self.fixed_point():
-                if len(self.nogood[-1]) == nogood_size:
+            if i == len(self.layers):
+                self.expand()
+            layered_plan = self.timed_extract(goal, i)
+            if layered_plan is None and self.fixed_point(i):
+                if self.nogood.size(i) == nogood_size:
                     # We reached the fixed point and the nogood set did not change
                     return None
-                nogood_size = len(self.nogood[-1])
-        self.trace += f'The extracted goal from layer {i} is {goal}\n\n'
-        self.trace += '##########################################################################################\n'
-        self.trace += '### This actually is the global goal. The plans for each layer have been concatenated. ###\n'
-        self.trace += '##########################################################################################\n\n'
-        self.trace += 'We can return the layered plan:\n'
-        for layer in layered_plan:
-            for action in layer:
-                if action.name != 'NOOP':
-                    self.trace += f'\t{action}\n'
+                nogood_size = self.nogood.size(i)
+        if self.trace.level >= SUMMARY:
+            self.trace.write(f'The extracted goal from layer {i} is {set(self.rd.propositions_of(goal))}\n\n'
+                             '##########################################################################################\n'
+                             '### This actually is the global goal. The plans for each layer have been concatenated. ###\n'
+                             '##########################################################################################\n\n'
+                             'We can return the layered plan:\n'
+                             + ''.join(f'\t{action}\n' for layer in layered_plan for action in layer if action.name != 'NOOP')
+                             + f'\nNogood store: {self.nogood.hits} hits, {self.nogood.misses} misses, '
+                               f'{self.nogood.minimal_size()} nogoods of {self.nogood.mean_length():.1f} propositions on average\n')
         return layered_plan
 
-    def fixed_point(self):
+    def sat_plan(self, goal):
         """
-        Returns wether or not the graph's last layer is the same as the previous one.
+        Extracts a plan for the goal by solving the CNF encoding of the graph, from the first layer that includes the goal
+        without mutexes and going to the next layers (expanding the graph when needed) until a plan is found.
+        A SAT solver cannot prove that no plan exists with more layers, so once the graph has leveled off, a failed layer is
+        also searched backward to record the nogoods of the termination test of extract_plan.
+        :param goal: a bitset of propositions
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        i = self.get_first_layer(goal)
+        nogood_size = self.nogood.size(i) if self.fixed_point(i) else 0
+        while True:
+            layered_plan = self.timed_sat(goal, i)
+            if layered_plan is None and self.fixed_point(i):
+                layered_plan = self.timed_extract(goal, i)
+                if layered_plan is None:
+                    if self.nogood.size(i) == nogood_size:
+                        return None
+                    nogood_size = self.nogood.size(i)
+            if layered_plan is not None:
+                break
+            i += 1
+            if i == len(self.layers):
+                self.expand()
+        if self.trace.level >= SUMMARY:
+            self.trace.write(f'The goal was extracted from layer {i}, we can return the layered plan:\n'
+                             + ''.join(f'\t{action}\n' for layer in layered_plan for action in layer if action.name != 'NOOP')
+                             + '\n')
+        return layered_plan
+
+    def timed_sat(self, goal, i):
+        """
+        Solves the CNF encoding of the layers 0 to i for the goal.
+        :param goal: a bitset of propositions
+        :param i: the layer index
+        :return: a list of sets of Action objects (a layered plan) or None (if there is no plan of i layers)
+        """
+        if i == 0:
+            # The goal holds in the initial state
+            return []
+        start = time.perf_counter()
+        encoding = GraphEncoding(self, goal, i, self.budget)
+        satisfiable = encoding.solve()
+        solver = encoding.solver
+        if self.stats is not None:
+            self.stats.extract_time[i] += time.perf_counter() - start
+            self.stats.sat_conflicts += solver.conflicts
+            self.stats.sat_decisions += solver.decisions
+            self.stats.emit('extraction')
+        if self.trace.level >= SUMMARY:
+            self.trace.write(f'Layer {i} encoded with {solver.nb_vars} variables and {encoding.nb_clauses} clauses: '
+                             f'{"satisfiable" if satisfiable else "unsatisfiable"} after {solver.conflicts} conflicts '
+                             f'and {solver.decisions} decisions\n\n')
+        return encoding.get_layered_plan(goal) if satisfiable else None
+
+    def forward_plan(self, goal):
+        """
+        Searches a plan for the goal forward from the initial state, the graph having shown that the goal is reachable.
+        The plan is not shortest in layers: the sequential plan found is compacted into layers of independent actions.
+        :param goal: a bitset of propositions
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        if self.trace.level >= SUMMARY:
+            self.trace.write('#######################################################\n'
+                             '### Searching a plan forward from the initial state ###\n'
+                             '#######################################################\n\n')
+        start = time.perf_counter()
+        search = ForwardSearch(self.rd, self.heuristic, self.weight, self.stats, self.budget)
+        plan = search.search(self.rd.init_mask, goal)
+        if self.stats is not None:
+            self.stats.extract_time[0] += time.perf_counter() - start
+            self.stats.heuristic_evaluations = search.heuristic.evaluations
+            self.stats.heuristic_cache_hits = search.heuristic.cache_hits
+            self.stats.emit('extraction')
+        if self.trace.level >= SUMMARY:
+            if plan is None:
+                self.trace.write(f'No plan found after expanding {search.expanded} states\n')
+            else:
+                self.trace.write(f'Plan of {len(plan)} actions found after expanding {search.expanded} states '
+                                 f'and {search.heuristic.evaluations} heuristic evaluations\n')
+        return None if plan is None else search.get_layered_plan(plan)
+
+    def timed_extract(self, goal, i):
+        """
+        Extracts the goal from layer i, recording the time spent and the nogood counters when stats are enabled.
+        :param goal: a bitset of propositions
+        :param i: the layer index
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        extract = self.iterative_extract if self.extraction == 'iterative' and self.trace.level < FULL else self.extract
+        if self.stats is None:
+            return extract(goal, i)
+        start = time.perf_counter()
+        layered_plan = extract(goal, i)
+        self.stats.extract_time[i] += time.perf_counter() - start
+        self.stats.nogood_hits = self.nogood.hits
+        self.stats.nogood_misses = self.nogood.misses
+        self.stats.nogood_size = self.nogood.minimal_size()
+        self.stats.nogood_length = self.nogood.mean_length()
+        self.stats.emit('extraction')
+        return layered_plan
+
+    def fixed_point(self, i=-1):
+        """
+        Returns wether or not a layer of the graph (the last one by default) is the same as the previous one.
+        :param i: the layer index
         :return: boolean
         """
-        if len(self.layers) < 2:
+        i %= len(self.layers)
+        if i == 0:
             return False
-        return self.layers[-1].propositions == self.layers[-2].propositions \
-            and self.layers[-1].actions == self.layers[-2].actions \
-            and self.layers[-1].mutex_propositions == self.layers[-2].mutex_propositions \
-            and self.layers[-1].mutex_actions == self.layers[-2].mutex_actions
+        layer = self.layers[i]
+        return layer is self.layers[i - 1] \
+            or (not layer.added_propositions and not layer.added_actions
+                and not layer.mutex_propositions.changes and not layer.mutex_actions.changes)
     
-    def continue_search(self, goal):
+    def continue_search(self, goal, i=-1):
         """
-        Returns wether or not the graph's last layer is a condidate to be the last of the search.
-        :param goal: a set of Proposition objects
+        Returns wether or not a layer of the graph (the last one by default) is not a condidate to be the last of the search.
+        :param goal: a bitset of propositions
+        :param i: the layer index
         :return: boolean
         """
-        if not goal.issubset(self.layers[-1].propositions):
+        if goal & ~self.layers[i].propositions:
             return True
-        for prop1 in goal:
-            for prop2 in goal:
-                if {prop1, prop2} in self.layers[-1].mutex_propositions:
-                    return True
+        mutex_propositions = self.layers[i].mutex_propositions
+        for prop_id in bits(goal):
+            if mutex_propositions.get(prop_id, 0) & goal:
+                return True
         return False
 
-    def get_providers(self, proposition, actions, positive_effects_links, current_plan, mutex_actions):
+    def set_levels(self, propositions, i):
+        for prop_id in bits(propositions):
+            self.proposition_levels[prop_id] = i
+
+    def get_action_cost(self, action):
+        """
+        Returns the sum of the levels of the preconditions of the action, memoized since levels never change once set.
+        :param action: Action object
+        :return: int
+        """
+        cost = self.action_costs.get(action.id)
+        if cost is None:
+            cost = sum(self.proposition_levels[prop_id] for prop_id in bits(action.preconditions_mask))
+            self.action_costs[action.id] = cost
+        return cost
+
+    def choose_subgoal(self, goal, layer, blocked):
+        """
+        Returns the hardest proposition of the goal: the one that appeared last in the graph, then the one with the fewest
+        providers left (not mutex with the current plan), then the one with the lowest rank (its id without seed).
+        :param goal: a bitset of propositions
+        :param layer: Layer object
+        :param blocked: bitset of the actions of the layer that are mutex with an action of the current plan
+        :return: Proposition object
+        """
+        available = layer.actions & ~blocked
+        adders = self.rd.interference.adders
+        levels = self.proposition_levels
+        ranks = self.proposition_ranks
+        best_id = best_key = None
+        for prop_id in bits(goal):
+            key = (-levels[prop_id], (adders[prop_id] & available).bit_count(), ranks[prop_id])
+            if best_key is None or key < best_key:
+                best_id, best_key = prop_id, key
+        return self.rd.propositions[best_id]
+
+    def get_providers(self, proposition, layer, current_plan, goal, blocked):
         """
         Returns a list of Action objects that can provide a given proposition.
         The action must not be mutex with any action in the current plan and must have the given proposition as a positive effect.
-        The returned list is sorted to have the No-op actions first.
+        The returned list is sorted by cost: No-op actions first, then by sum of the levels of the preconditions, then by
+        decreasing number of other goal propositions provided, then by rank (id without seed). With symmetry, the providers
+        that are symmetric to a previous one for the goal and the current plan are left out.
         :param proposition: Proposition object
-        :param actions: set of Action objects
-        :param positive_effects_links: set of tuples of Action and Proposition objects
+        :param layer: Layer object
         :param current_plan: set of Action objects
-        :param mutex_actions: set of frozen sets of Action objects
+        :param goal: a bitset of propositions, the goal being extracted
+        :param blocked: bitset of the actions of the layer that are mutex with an action of the current plan
         :return: list of Action objects
         """
-        providers = set()
-        for action in actions:
-            if (action, proposition) in positive_effects_links:
-                for added_action in current_plan:
-                    if {action, added_action} in mutex_actions:
-                        break
-                else:
-                    providers.add(action)
-        providers = list(providers)
-        providers.sort(key=lambda action: action.name != 'NOOP')
+        if self.stats is not None:
+            self.stats.providers_calls += 1
+        available = self.rd.interference.adders[proposition.id] & layer.actions & ~blocked
+        providers = list(self.rd.actions_of(available))
+        providers.sort(key=lambda action: (action.name != 'NOOP', self.get_action_cost(action),
+                                           -(action.positive_effects_mask & goal).bit_count(),
+                                           self.action_ranks[action.id]))
+        if self.symmetry is not None:
+            providers = self.symmetry.prune_providers(providers, goal | 1 << proposition.id, current_plan)
+            if self.stats is not None:
+                self.stats.symmetric_providers = self.symmetry.pruned_providers
         return providers
 
-    def get_producers(self, proposition, actions):
-        """
-        Returns a set of actions that have the given proposition as a positive effect.
-        :param proposition: Proposition object
-        :param actions: list of Action objects
-        :return: list
-        """
-        return {action for action in actions if proposition in action.positive_effects}
-    
     def are_mutex_actions(self, action1, action2, mutex_propositions):
         if action1 == action2:
             return False
-        if self.rd.actions_dependencies[(action1, action2)]:
+        if self.rd.interference.are_interfering(action1, action2):
             return True
-        for prop1 in action1.preconditions:
-            for prop2 in action2.preconditions:
-                if {prop1, prop2} in mutex_propositions:
-                    return True
+        for prop_id in bits(action1.preconditions_mask):
+            if mutex_propositions.get(prop_id, 0) & action2.preconditions_mask:
+                return True
         return False
 
     def are_mutex_propositions(self, prop1, prop2, actions, mutex_actions):
         if prop1 == prop2:
             return False
-        for action1 in self.get_producers(prop1, actions):
-            for action2 in self.get_producers(prop2, actions):
-                if {action1, action2} not in mutex_actions:
-                    return False
+        producers2 = self.rd.interference.adders[prop2.id] & actions
+        for action_id in bits(self.rd.interference.adders[prop1.id] & actions):
+            if producers2 & ~mutex_actions.get(action_id, 0):
+                return False
         return True
 
     def get_mutex_actions(self, actions, mutex_propositions):
         """
-        Returns a set of frozen sets of actions that are mutex.
+        Returns the map from each action id to the bitset of the actions it is mutex with.
         :param actions: list of Action objects
-        :param mutex_propositions: list of tuples of Proposition objects
-        :return: list
+        :param mutex_propositions: DeltaMap object
+        :return: dict
         """
-        return {frozenset([action1, action2]) for action1 in actions for action2 in actions if self.are_mutex_actions(action1, action2, mutex_propositions)}
+        mutex_actions = {}
+        for action1 in actions:
+            for action2 in actions:
+                if self.are_mutex_actions(action1, action2, mutex_propositions):
+                    add_pair(mutex_actions, action1.id, action2.id)
+        return mutex_actions
 
     def get_mutex_propositions(self, propositions, actions, mutex_actions):
         """
-        Returns a set of frozen sets of propositions that are mutex.
+        Returns the map from each proposition id to the bitset of the propositions it is mutex with.
         :param propositions: list of Proposition objects
-        :param mutex_actions: list of tuples of Action objects
-        :return: list
+        :param actions: bitset of actions
+        :param mutex_actions: DeltaMap object
+        :return: dict
         """
-        return {frozenset([prop1, prop2]) for prop1 in propositions for prop2 in propositions if self.are_mutex_propositions(prop1, prop2, actions, mutex_actions)}
-    
-    def get_next_actions(self, previous_propositions, previous_mutex_propositions):
+        mutex_propositions = {}
+        for prop1 in propositions:
+            for prop2 in propositions:
+                if self.are_mutex_propositions(prop1, prop2, actions, mutex_actions):
+                    add_pair(mutex_propositions, prop1.id, prop2.id)
+        return mutex_propositions
+
+    def update_mutex_actions(self, actions, previous_layer, mutex_propositions, released_propositions):
+        """
+        Returns the map of mutex actions, derived from the mutex actions of the previous layer.
+        Since mutexes can only disappear from one layer to the next, two actions of the previous layer that were not mutex
+        are still not mutex. Two actions that were mutex only because of competing needs are checked again if one of
+        their preconditions lost a mutex. Pairs involving a new action are checked from scratch.
+        :param actions: list of Action objects
+        :param previous_layer: Layer object
+        :param mutex_propositions: DeltaMap object
+        :param released_propositions: bitset of the propositions that lost a mutex since the previous layer was built
+        :return: dict, number of rechecked pairs
+        """
+        rechecked = 0
+        mutex_actions = {}
+        for id1, id2 in iter_pairs(previous_layer.mutex_actions):
+            action1, action2 = self.rd.actions[id1], self.rd.actions[id2]
+            if self.rd.interference.are_interfering(action1, action2) \
+                    or not (action1.preconditions_mask | action2.preconditions_mask) & released_propositions:
+                add_pair(mutex_actions, id1, id2)
+            else:
+                rechecked += 1
+                if self.are_mutex_actions(action1, action2, mutex_propositions):
+                    add_pair(mutex_actions, id1, id2)
+        old_actions = [action for action in actions if previous_layer.actions >> action.id & 1]
+        new_actions = [action for action in actions if not previous_layer.actions >> action.id & 1]
+        for k, action1 in enumerate(new_actions):
+            for action2 in old_actions + new_actions[k + 1:]:
+                rechecked += 1
+                if self.are_mutex_actions(action1, action2, mutex_propositions):
+                    add_pair(mutex_actions, action1.id, action2.id)
+        return mutex_actions, rechecked
+
+    def update_mutex_propositions(self, propositions, actions, mutex_actions, previous_layer, touched_propositions):
+        """
+        Returns the map of mutex propositions, derived from the mutex propositions of the previous layer.
+        Two propositions of the previous layer that were mutex are checked again only if one of them is touched (it gained
+        a producer or one of its producers lost a mutex), the others keep their previous status. Pairs involving a new
+        proposition are checked from scratch.
+        :param propositions: list of Proposition objects
+        :param actions: bitset of actions
+        :param mutex_actions: DeltaMap object
+        :param previous_layer: Layer object
+        :param touched_propositions: bitset of propositions
+        :return: dict, number of rechecked pairs
+        """
+        rechecked = 0
+        mutex_propositions = {}
+        for id1, id2 in iter_pairs(previous_layer.mutex_propositions):
+            if not (touched_propositions >> id1 & 1 or touched_propositions >> id2 & 1):
+                add_pair(mutex_propositions, id1, id2)
+            else:
+                rechecked += 1
+                if self.are_mutex_propositions(self.rd.propositions[id1], self.rd.propositions[id2], actions, mutex_actions):
+                    add_pair(mutex_propositions, id1, id2)
+        old_propositions = [prop for prop in propositions if previous_layer.propositions >> prop.id & 1]
+        new_propositions = [prop for prop in propositions if not previous_layer.propositions >> prop.id & 1]
+        for k, prop1 in enumerate(new_propositions):
+            for prop2 in old_propositions + new_propositions[k + 1:]:
+                rechecked += 1
+                if self.are_mutex_propositions(prop1, prop2, actions, mutex_actions):
+                    add_pair(mutex_propositions, prop1.id, prop2.id)
+        return mutex_propositions, rechecked
+
+    def get_next_actions(self, previous_propositions, previous_mutex_propositions, skipped_actions=0):
         """
-        Returns a set of Action objects that can be added to the next layer.
-        :param previous_propositions: list of Proposition objects
-        :param previous_mutex_propositions: list of tuples of Proposition objects
-        :return: list
+        Returns the bitset of the actions that can be added to the next layer.
+        :param previous_propositions: bitset of propositions
+        :param previous_mutex_propositions: DeltaMap object
+        :param skipped_actions: bitset of actions that are not checked (and not returned)
+        :return: int
         """
-        next_actions = set()
-        for action in self.rd.actions:
-            for prop1 in action.preconditions:
-                if prop1 not in previous_propositions:
+        next_actions = 0
+        for action in self.rd.actions_of(self.allowed_actions & ~skipped_actions):
+            if action.preconditions_mask & ~previous_propositions:
+                continue
+            for prop_id in bits(action.preconditions_mask):
+                if previous_mutex_propositions.get(prop_id, 0) & action.preconditions_mask:
                     break
-                for prop2 in action.preconditions:
-                    if {prop1, prop2} in previous_mutex_propositions:
-                        break
-                else:
-                    continue
-                break
             else:
-                next_actions.add(action)
+                next_actions |= 1 << action.id
         return next_actions
     
     def get_next_propositions(self, current_actions):
         """
-        Returns a set of Proposition objects that can be added to the next layer.
-        :param actions: set of Action objects
-        :return: set
+        Returns the bitset of the propositions that can be added to the next layer.
+        :param actions: list of Action objects
+        :return: int
         """
-        next_propositions = set()
+        next_propositions = 0
         for action in current_actions:
-            for prop in action.positive_effects:
-                next_propositions.add(prop)
+            next_propositions |= action.positive_effects_mask
         return next_propositions
     
     def write_trace(self):
-        with open(f'trace_{self.rd.r_fact.split("/")[-1]}', 'w') as f:
-            f.write(self.trace)
+        """
+        Flushes the trace sink and closes its file.
+        """
+        self.trace.close()
 
 
 if __name__ == "__main__":
     r_fact = 'examples/my_r_fact9.txt'
-    gp = GraphPlan(r_fact)
+    gp = GraphPlan(r_fact, trace_level=FULL)
     layered_plan = gp.graphplan()
     gp.write_trace()
     # print('\n\nGoal:')
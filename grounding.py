@@ -0,0 +1,142 @@
+import itertools
+import re
+
+
+class OperatorSchema:
+    """
+    Operator of a r_ops file. Parameters are (variable, type) tuples, and preconditions and effects are (predicate, args)
+    tuples whose args are variables (written <name>) or object names.
+    """
+    def __init__(self, name, parameters, preconditions, positive_effects, negative_effects):
+        self.name = name
+        self.parameters = parameters
+        self.preconditions = preconditions
+        self.positive_effects = positive_effects
+        self.negative_effects = negative_effects
+
+    def __repr__(self):
+        return f'OperatorSchema({self.name}, {self.parameters})'
+
+    def get_bindings(self, facts, objects):
+        """
+        Yields the bindings of the parameters (dicts from variable to object) whose preconditions all belong to the facts.
+        Parameters that appear in the preconditions are bound by matching the facts, the others take every object of their type.
+        :param facts: dict from predicate to the list of the args tuples of the facts with that predicate
+        :param objects: dict from type to the list of objects of that type
+        :return: generator of dict
+        """
+        allowed = {variable: set(objects.get(type, ())) for variable, type in self.parameters}
+
+        def extend(k, binding):
+            if k == len(self.preconditions):
+                free = [(variable, type) for variable, type in self.parameters if variable not in binding]
+                for values in itertools.product(*(objects.get(type, ()) for _, type in free)):
+                    yield dict(binding, **dict(zip((variable for variable, _ in free), values)))
+                return
+            predicate, args = self.preconditions[k]
+            for fact_args in facts.get(predicate, ()):
+                if len(fact_args) != len(args):
+                    continue
+                new_binding = dict(binding)
+                for arg, value in zip(args, fact_args):
+                    if is_variable(arg):
+                        if new_binding.setdefault(arg, value) != value or value not in allowed.get(arg, ()):
+                            break
+                    elif arg != value:
+                        break
+                else:
+                    yield from extend(k + 1, new_binding)
+
+        yield from extend(0, {})
+
+    def instantiate(self, atoms, binding):
+        return [(predicate, tuple(binding.get(arg, arg) for arg in args)) for predicate, args in atoms]
+
+
+def is_variable(arg):
+    return arg.startswith('<') and arg.endswith('>')
+
+
+def parse_sexpressions(text):
+    """
+    Returns the list of the s-expressions of a text (nested lists of str), ignoring /* */ comments.
+    :param text: str
+    :return: list
+    """
+    text = re.sub(r'/\*.*?\*/', ' ', text, flags=re.DOTALL)
+    stack = [[]]
+    for token in re.findall(r'\(|\)|[^\s()]+', text):
+        if token == '(':
+            stack.append([])
+        elif token == ')':
+            if len(stack) > 1:
+                expression = stack.pop()
+                stack[-1].append(expression)
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+def parse_operators(r_ops):
+    """
+    Returns the operator schemas of a r_ops file.
+    :param r_ops: path of the file
+    :return: list of OperatorSchema objects
+    """
+    with open(r_ops, 'r') as f:
+        expressions = parse_sexpressions(f.read())
+    schemas = []
+    for expression in expressions:
+        if not isinstance(expression, list) or not expression or expression[0] != 'operator':
+            continue
+        name = expression[1]
+        parameters, preconditions, positive_effects, negative_effects = [], [], [], []
+        for section in expression[2:]:
+            if section[0] == 'params':
+                parameters = [(parameter[0], parameter[1]) for parameter in section[1:]]
+            elif section[0] == 'preconds':
+                preconditions = [(atom[0], tuple(atom[1:])) for atom in section[1:]]
+            elif section[0] == 'effects':
+                for atom in section[1:]:
+                    if atom[0] == 'del':
+                        negative_effects.append((atom[1], tuple(atom[2:])))
+                    else:
+                        positive_effects.append((atom[0], tuple(atom[1:])))
+        schemas.append(OperatorSchema(name, parameters, preconditions, positive_effects, negative_effects))
+    return schemas
+
+
+def ground(schemas, objects, init_facts):
+    """
+    Instantiates the operators that are reachable from the initial facts when negative effects are ignored (relaxed
+    reachability), and the facts they can reach. Actions whose positive and negative effects overlap are left out.
+    Everything is returned in a deterministic order (the initial facts first, then by discovery).
+    :param schemas: list of OperatorSchema objects
+    :param objects: dict from type to the list of objects of that type
+    :param init_facts: list of (predicate, args tuple)
+    :return: list of the reachable facts, list of (name, args, preconditions, positive effects, negative effects) tuples
+    """
+    reachable = dict.fromkeys(init_facts)
+    actions = {}
+    changed = True
+    while changed:
+        changed = False
+        facts = {}
+        for predicate, args in reachable:
+            facts.setdefault(predicate, []).append(args)
+        for schema in schemas:
+            for binding in schema.get_bindings(facts, objects):
+                args = tuple(binding[variable] for variable, _ in schema.parameters)
+                if (schema.name, args) in actions:
+                    continue
+                positive_effects = schema.instantiate(schema.positive_effects, binding)
+                negative_effects = schema.instantiate(schema.negative_effects, binding)
+                if set(positive_effects) & set(negative_effects):
+                    continue
+                actions[(schema.name, args)] = (schema.name, args, schema.instantiate(schema.preconditions, binding),
+                                                positive_effects, negative_effects)
+                for fact in positive_effects:
+                    if fact not in reachable:
+                        reachable[fact] = None
+                        changed = True
+    return list(reachable), list(actions.values())
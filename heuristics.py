@@ -0,0 +1,186 @@
+import heapq
+
+from domain import bits
+
+
+class RelaxedHeuristic:
+    """
+    Heuristics computed on the relaxed planning graph of a state (the planning graph without negative effects nor mutexes),
+    with the bitsets of the domain and its interference index:
+    - 'max': h_max, the first layer in which the whole goal holds,
+    - 'add': h_add, the sum of the costs of the goal propositions, the cost of a proposition being 0 if it holds in the
+      state, else 1 plus the sum of the costs of the preconditions of its cheapest producer,
+    - 'ff': the number of actions of a relaxed plan extracted backward from the layers, as in FF.
+    'max' and 'ff' expand the relaxed graph layer by layer until the goal holds, 'add' computes the costs in increasing
+    order (generalized Dijkstra). The values are cached for each (state, goal) pair.
+    """
+    def __init__(self, rd, name='ff'):
+        if name not in ('max', 'add', 'ff'):
+            raise ValueError(f'Unknown heuristic {name}, expected max, add or ff')
+        self.rd = rd
+        self.name = name
+        self.actions = [action for action in rd.actions if action.name != 'NOOP']
+        # consumers[prop_id] = actions (other than No-op actions) having the proposition as a precondition
+        self.consumers = [[] for _ in rd.propositions]
+        for action in self.actions:
+            for prop_id in bits(action.preconditions_mask):
+                self.consumers[prop_id].append(action)
+        self.free_actions = [action for action in self.actions if not action.preconditions_mask]
+        # Bitsets of the No-op actions, left out of the relaxed graph, and of the actions without preconditions
+        self.noops_mask = 0
+        for action in rd.actions:
+            if action.name == 'NOOP':
+                self.noops_mask |= 1 << action.id
+        self.free_actions_mask = 0
+        for action in self.free_actions:
+            self.free_actions_mask |= 1 << action.id
+        self.cache = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+
+    def __call__(self, state, goal):
+        """
+        Returns the heuristic value of the state for the goal, or None if the goal is not reachable from the state.
+        :param state: bitset of propositions
+        :param goal: bitset of propositions
+        :return: int or None
+        """
+        key = (state, goal)
+        value = self.cache.get(key, -1)
+        if value != -1:
+            self.cache_hits += 1
+            return value
+        self.evaluations += 1
+        value = self.evaluate(state, goal)
+        self.cache[key] = value
+        return value
+
+    def evaluate(self, state, goal):
+        if self.name == 'add':
+            costs = self.get_costs(state, goal)
+            if any(prop_id not in costs for prop_id in bits(goal)):
+                return None
+            return sum(costs[prop_id] for prop_id in bits(goal))
+        layers = self.get_layers(state, goal)
+        if layers is None:
+            return None
+        proposition_layers, action_layers = layers
+        if self.name == 'max':
+            return len(action_layers)
+        return self.get_relaxed_plan_size(state, goal, proposition_layers, action_layers)
+
+    def get_layers(self, state, goal):
+        """
+        Expands the relaxed planning graph of the state until the goal holds.
+        An action is only checked when one of its preconditions has just been added, so each action is checked at most
+        once per precondition.
+        :param state: bitset of propositions
+        :param goal: bitset of propositions
+        :return: (list of the bitsets of the propositions added in each layer, the first one being the state, list of the
+        bitsets of the actions applicable for the first time in each layer), or None if the goal is not reachable
+        """
+        consumers = self.rd.interference.consumers
+        actions = self.rd.actions
+        proposition_layers = [state]
+        action_layers = []
+        reached = state
+        applied = self.noops_mask
+        added = state
+        candidates = self.free_actions_mask
+        while goal & ~reached:
+            for prop_id in bits(added):
+                candidates |= consumers[prop_id]
+            candidates &= ~applied
+            applicable = 0
+            effects = 0
+            for action_id in bits(candidates):
+                action = actions[action_id]
+                if not action.preconditions_mask & ~reached:
+                    applicable |= 1 << action_id
+                    effects |= action.positive_effects_mask
+            added = effects & ~reached
+            if not added:
+                return None
+            applied |= applicable
+            reached |= added
+            proposition_layers.append(added)
+            action_layers.append(applicable)
+            candidates = 0
+        return proposition_layers, action_layers
+
+    def get_relaxed_plan_size(self, state, goal, proposition_layers, action_layers):
+        """
+        Returns the number of actions of a relaxed plan for the goal: going down the layers, each open proposition of layer
+        k is supported by an action first applicable in layer k - 1 (the one with the cheapest preconditions, then the
+        lowest id), whose preconditions become open in their own first layers.
+        :return: int
+        """
+        adders = self.rd.interference.adders
+        actions = self.rd.actions
+
+        def get_level(prop_id):
+            for k, added in enumerate(proposition_layers):
+                if added >> prop_id & 1:
+                    return k
+
+        open_goals = [0] * len(proposition_layers)
+        for k, added in enumerate(proposition_layers):
+            open_goals[k] = goal & added
+        size = 0
+        for k in range(len(proposition_layers) - 1, 0, -1):
+            achieved = 0
+            for prop_id in bits(open_goals[k]):
+                if achieved >> prop_id & 1:
+                    continue
+                supporters = list(bits(adders[prop_id] & action_layers[k - 1]))
+                if len(supporters) == 1:
+                    action = actions[supporters[0]]
+                else:
+                    action = min((actions[action_id] for action_id in supporters),
+                                 key=lambda action: (sum(map(get_level, bits(action.preconditions_mask))), action.id))
+                size += 1
+                achieved |= action.positive_effects_mask
+                for precondition_id in bits(action.preconditions_mask & ~state):
+                    open_goals[get_level(precondition_id)] |= 1 << precondition_id
+        return size
+
+    def get_costs(self, state, goal):
+        """
+        Returns the h_add costs of the propositions reachable from the state, computed in increasing cost order (generalized
+        Dijkstra) until every goal proposition has its final cost.
+        :param state: bitset of propositions
+        :param goal: bitset of propositions
+        :return: dict from proposition id to cost
+        """
+        costs = {prop_id: 0 for prop_id in bits(state)}
+        heap = [(0, prop_id) for prop_id in costs]
+        remaining = {}
+        combined = {}
+        done = 0
+        pending_goal = goal
+
+        def support(action, cost):
+            for prop_id in bits(action.positive_effects_mask):
+                if cost < costs.get(prop_id, cost + 1):
+                    costs[prop_id] = cost
+                    heapq.heappush(heap, (cost, prop_id))
+
+        for action in self.free_actions:
+            support(action, 1)
+        while heap and pending_goal:
+            cost, prop_id = heapq.heappop(heap)
+            if done >> prop_id & 1:
+                continue
+            done |= 1 << prop_id
+            pending_goal &= ~(1 << prop_id)
+            for action in self.consumers[prop_id]:
+                count = remaining.get(action.id)
+                if count is None:
+                    count = action.preconditions_mask.bit_count()
+                    combined[action.id] = cost
+                else:
+                    combined[action.id] += cost
+                remaining[action.id] = count - 1
+                if count == 1:
+                    support(action, combined[action.id] + 1)
+        return costs
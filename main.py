@@ -1,8 +1,9 @@
 from graphplan import GraphPlan
+from tracing import FULL
 
 
 def DoPlan(r_ops, r_facts):
-    gp = GraphPlan(r_facts)
+    gp = GraphPlan(r_facts, r_ops, trace_level=FULL)
     _ = gp.graphplan()
     gp.write_trace()
 
@@ -0,0 +1,156 @@
+from domain import bits
+
+
+class NogoodIndex:
+    """
+    Set of nogoods (bitsets of propositions) answering whether one of them is a subset of a given goal.
+    For each proposition id, containing[id] is the bitset of the slots of the nogoods containing that proposition, so a query
+    only costs one AND per proposition that appears in a nogood but not in the goal.
+    Only minimal nogoods are kept: a nogood that is a superset of a stored one brings no information.
+    """
+    def __init__(self):
+        self.masks = []
+        self.free_slots = []
+        self.slots = 0
+        self.containing = {}
+        # Union of the stored nogoods (may keep propositions of removed nogoods, which is harmless)
+        self.universe = 0
+        # Total number of propositions of the stored nogoods
+        self.length = 0
+
+    def __len__(self):
+        return len(self.masks) - len(self.free_slots)
+
+    def find_subset(self, goal):
+        """
+        Returns wether or not a stored nogood is a subset of the given goal.
+        :param goal: bitset of propositions
+        :return: boolean
+        """
+        candidates = self.slots
+        for prop_id in bits(self.universe & ~goal):
+            candidates &= ~self.containing[prop_id]
+            if not candidates:
+                return False
+        return candidates != 0
+
+    def insert(self, nogood):
+        """
+        Stores a nogood unless it is a superset of a stored one, and removes the stored nogoods that are supersets of it.
+        :param nogood: bitset of propositions
+        :return: boolean, True if the nogood was stored
+        """
+        if self.find_subset(nogood):
+            return False
+        supersets = self.slots
+        for prop_id in bits(nogood):
+            supersets &= self.containing.get(prop_id, 0)
+        for slot in bits(supersets):
+            self.remove(slot)
+        slot = self.free_slots.pop() if self.free_slots else len(self.masks)
+        if slot == len(self.masks):
+            self.masks.append(nogood)
+        else:
+            self.masks[slot] = nogood
+        bit = 1 << slot
+        self.slots |= bit
+        for prop_id in bits(nogood):
+            self.containing[prop_id] = self.containing.get(prop_id, 0) | bit
+        self.universe |= nogood
+        self.length += nogood.bit_count()
+        return True
+
+    def remove(self, slot):
+        bit = 1 << slot
+        for prop_id in bits(self.masks[slot]):
+            self.containing[prop_id] &= ~bit
+        self.length -= self.masks[slot].bit_count()
+        self.masks[slot] = 0
+        self.slots &= ~bit
+        self.free_slots.append(slot)
+
+
+class NogoodStore:
+    """
+    Goals proven unreachable, for each layer of the planning graph.
+    A goal that is unreachable from layer i is also unreachable from every layer below i (a plan from a lower layer could be
+    shifted up with No-op actions), so a nogood is only indexed in the layer where it was found, and a goal is known to be
+    unreachable from layer i as soon as one of the nogoods indexed in layer i or above is a subset of it.
+    With a canonicalize function mapping goals to their image by a symmetry of the problem (see symmetry.Symmetry), the
+    nogoods are indexed and looked up by their images, the recorded goals staying the exact ones.
+    With subset False, a goal is only known to be unreachable if it was recorded itself (no index is kept).
+    """
+    def __init__(self, canonicalize=None, subset=True):
+        self.canonicalize = canonicalize
+        self.subset = subset
+        # recorded[i] = set of the goals that failed from layer i, whose size drives the termination test of GraphPlan
+        self.recorded = [set()]
+        self.indexes = [NogoodIndex()]
+        self.hits = 0
+        self.misses = 0
+
+    def add_layer(self):
+        self.recorded.append(set())
+        self.indexes.append(NogoodIndex())
+
+    def is_nogood(self, goal, i):
+        """
+        Returns wether or not the goal is known to be unreachable from layer i, and updates the hit and miss counters.
+        :param goal: bitset of propositions
+        :param i: the layer index
+        :return: boolean
+        """
+        if goal in self.recorded[i]:
+            self.hits += 1
+            return True
+        if self.subset:
+            image = goal if self.canonicalize is None else self.canonicalize(goal)
+            for j in range(i, len(self.indexes)):
+                if self.indexes[j].find_subset(image):
+                    # Record the goal itself, as if it had been searched and had failed
+                    self.recorded[i].add(goal)
+                    self.hits += 1
+                    return True
+        self.misses += 1
+        return False
+
+    def add(self, goal, i):
+        """
+        Records a goal that is unreachable from layer i.
+        :param goal: bitset of propositions
+        :param i: the layer index
+        """
+        self.recorded[i].add(goal)
+        if not self.subset:
+            return
+        self.indexes[i].insert(goal if self.canonicalize is None else self.canonicalize(goal))
+
+    def size(self, i):
+        """
+        Returns the number of goals recorded as unreachable from layer i.
+        :param i: the layer index
+        :return: int
+        """
+        return len(self.recorded[i])
+
+    def minimal_size(self):
+        """
+        Returns the number of nogoods kept over all layers: the minimal nogoods indexed, or the recorded goals with subset
+        False.
+        :return: int
+        """
+        if not self.subset:
+            return sum(len(recorded) for recorded in self.recorded)
+        return sum(len(index) for index in self.indexes)
+
+    def mean_length(self):
+        """
+        Returns the mean number of propositions of the nogoods counted by minimal_size (0 if there is none).
+        :return: float
+        """
+        if not self.subset:
+            length = sum(goal.bit_count() for recorded in self.recorded for goal in recorded)
+        else:
+            length = sum(index.length for index in self.indexes)
+        size = self.minimal_size()
+        return length / size if size else 0.0
@@ -0,0 +1,97 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from domain import bits
+
+
+class MatrixMutexes:
+    """
+    Layer expansion on boolean matrices, as an optional backend of GraphPlan (mutex_backend='numpy').
+    The precondition, add and delete incidence matrices of the actions (actions x propositions) are built once, then each
+    layer is computed from the proposition mutex matrix of the previous one with a few matrix products:
+    - applicable actions: preconditions in the previous layer and no mutex pair of preconditions,
+    - action mutexes: interference (one deletes a precondition or a positive effect of the other) or competing needs
+      (mutex preconditions),
+    - proposition mutexes: no pair of non-mutex producers.
+    Products are computed on float32 matrices (counts, compared to 0) to use BLAS. The mutexes are converted back to the
+    partner bitsets of GraphPlan for the extraction and the trace.
+    """
+    def __init__(self, rd):
+        if np is None:
+            raise ImportError('The numpy mutex backend requires NumPy, install it with pip install numpy '
+                              'or use mutex_backend=\'python\'')
+        self.rd = rd
+        nb_actions, nb_propositions = len(rd.actions), len(rd.propositions)
+        self.preconditions = np.zeros((nb_actions, nb_propositions), dtype=np.float32)
+        self.positive_effects = np.zeros((nb_actions, nb_propositions), dtype=np.float32)
+        self.negative_effects = np.zeros((nb_actions, nb_propositions), dtype=np.float32)
+        for action in rd.actions:
+            self.preconditions[action.id, list(bits(action.preconditions_mask))] = 1
+            self.positive_effects[action.id, list(bits(action.positive_effects_mask))] = 1
+            self.negative_effects[action.id, list(bits(action.negative_effects_mask))] = 1
+        self.nb_preconditions = self.preconditions.sum(axis=1)
+        # Interference does not depend on the layer
+        interference = self.negative_effects @ np.maximum(self.preconditions, self.positive_effects).T > 0
+        self.interference = interference | interference.T
+
+    def to_vector(self, mask, size):
+        vector = np.zeros(size, dtype=bool)
+        vector[list(bits(mask))] = True
+        return vector
+
+    def to_matrix(self, partners, size):
+        """
+        Returns the boolean matrix of a map from ids to bitsets of partners.
+        :param partners: DeltaMap object or dict
+        :param size: int
+        :return: numpy array
+        """
+        matrix = np.zeros((size, size), dtype=bool)
+        for key, mask in partners.items():
+            matrix[key, list(bits(mask))] = True
+        return matrix
+
+    @staticmethod
+    def to_mask(vector):
+        return int.from_bytes(np.packbits(vector, bitorder='little').tobytes(), 'little')
+
+    def to_partners(self, matrix):
+        """
+        Returns the map from ids to bitsets of partners of a boolean matrix, without the ids that have no partner.
+        :param matrix: numpy array
+        :return: dict
+        """
+        packed = np.packbits(matrix, axis=1, bitorder='little')
+        return {int(key): int.from_bytes(packed[key].tobytes(), 'little') for key in np.flatnonzero(matrix.any(axis=1))}
+
+    def expand(self, propositions, mutex_propositions, allowed_actions):
+        """
+        Returns the actions and the action and proposition mutexes of the layer following a layer.
+        :param propositions: bitset of the propositions of the previous layer
+        :param mutex_propositions: DeltaMap object, the proposition mutexes of the previous layer
+        :param allowed_actions: bitset of the actions the graph can contain
+        :return: bitset of actions, dict of action mutexes, dict of proposition mutexes (see GraphPlan.get_mutex_actions and
+        GraphPlan.get_mutex_propositions)
+        """
+        nb_actions, nb_propositions = self.preconditions.shape
+        mutex_matrix = self.to_matrix(mutex_propositions, nb_propositions).astype(np.float32)
+        present = self.to_vector(propositions, nb_propositions).astype(np.float32)
+        # Mutex preconditions: for each pair of actions, number of mutex pairs between their preconditions
+        needs = self.preconditions @ mutex_matrix
+        applicable = (self.preconditions @ present == self.nb_preconditions) \
+            & ((needs * self.preconditions).sum(axis=1) == 0) \
+            & self.to_vector(allowed_actions, nb_actions)
+        action_ids = np.flatnonzero(applicable)
+        mutex_actions = self.interference[np.ix_(action_ids, action_ids)] \
+            | (needs[action_ids] @ self.preconditions[action_ids].T > 0)
+        np.fill_diagonal(mutex_actions, False)
+        # Producers of each pair of propositions that are not mutex (an action is not mutex with itself)
+        producers = self.positive_effects[action_ids]
+        free_pairs = producers.T @ (~mutex_actions).astype(np.float32) @ producers > 0
+        produced = producers.any(axis=0)
+        mutex_propositions = ~free_pairs & produced[:, None] & produced[None, :]
+        action_mutex_matrix = np.zeros((nb_actions, nb_actions), dtype=bool)
+        action_mutex_matrix[np.ix_(action_ids, action_ids)] = mutex_actions
+        return self.to_mask(applicable), self.to_partners(action_mutex_matrix), self.to_partners(mutex_propositions)
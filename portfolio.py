@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import time
+
+from batch import WorkerPool, run_graphplan
+from validate import PlanValidator
+
+# GraphPlan arguments of the configurations started by default, in order of priority (the first ones are started first
+# when there are fewer workers than configurations)
+PORTFOLIO = [
+    {'engine': 'sat'},
+    {'symmetry': True},
+    {'engine': 'forward'},
+    {},
+    {'symmetry': True, 'seed': 1},
+    {'seed': 2, 'nogood': 'exact'},
+    {'symmetry': True, 'seed': 3, 'nogood': 'exact'},
+    {'engine': 'forward', 'heuristic': 'add'},
+]
+
+
+def run_configuration(r_fact, r_ops, configuration):
+    """
+    Solves a problem with a configuration and validates the plan, an invalid plan getting the 'invalid' status.
+    :return: dict
+    """
+    result, gp, layered_plan = run_graphplan(r_fact, r_ops, **configuration)
+    if layered_plan is not None and not PlanValidator(gp.rd).is_valid(layered_plan):
+        result['status'] = 'invalid'
+    return result
+
+
+def solve_portfolio(r_fact, r_ops=None, configurations=None, workers=None, timeout=None):
+    """
+    Solves a problem with several configurations in separate processes and returns the result of the first one that finds a
+    valid plan or proves that there is none, the other processes being killed.
+    :param r_fact: path of a r_fact file
+    :param r_ops: path of a r_ops file to ground the actions from, or None for the built-in rocket actions
+    :param configurations: list of dicts of GraphPlan arguments, PORTFOLIO by default
+    :param workers: number of processes running at the same time, one per configuration (up to the number of cores) by
+    default
+    :param timeout: maximal wall time in seconds for each configuration, or None
+    :return: dict with the status ('solved', 'no-plan' or 'failed' when no configuration answered), the winning
+    configuration and its index, and the status of every configuration ('cancelled' for those that were stopped)
+    """
+    configurations = PORTFOLIO if configurations is None else configurations
+    workers = workers or min(len(configurations), os.cpu_count())
+    start = time.perf_counter()
+    result = {'problem': r_fact, 'status': 'failed'}
+    statuses = ['cancelled'] * len(configurations)
+    pool = WorkerPool(max(1, min(workers, len(configurations))), task=run_configuration)
+    try:
+        tasks = [(r_fact, r_ops, configuration) for configuration in configurations]
+        for index, configuration_result in pool.run(tasks, timeout, labels=range(len(configurations))):
+            statuses[index] = configuration_result['status']
+            if configuration_result['status'] in ('solved', 'no-plan'):
+                result.update(configuration_result, problem=r_fact, winner=index, configuration=configurations[index])
+                break
+    finally:
+        # Kills the configurations that are still running
+        pool.close()
+    result['wall_time'] = time.perf_counter() - start
+    result['statuses'] = statuses
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solves a r_fact problem with a portfolio of configurations in parallel '
+                                                 'and writes the first answer as a JSON line.')
+    parser.add_argument('r_fact', help='r_fact file')
+    parser.add_argument('--ops', default=None, help='r_ops file to ground the reachable actions from')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--timeout', type=float, default=None, help='maximal wall time in seconds for each configuration')
+    parser.add_argument('--configurations', default=None,
+                        help='JSON list of dicts of GraphPlan arguments (the default portfolio otherwise)')
+    args = parser.parse_args()
+
+    configurations = json.loads(args.configurations) if args.configurations else None
+    print(json.dumps(solve_portfolio(args.r_fact, args.ops, configurations, args.workers, args.timeout)))
@@ -0,0 +1,175 @@
+import argparse
+import glob
+import importlib.util
+import os
+import sys
+
+from batch import WorkerPool, find_problems, run_graphplan
+from graphplan import GraphPlan
+from stats import SolverStats
+from validate import PlanValidator
+
+# GraphPlan arguments of each configuration checked by the regression
+CONFIGURATIONS = {
+    'graphplan': {},
+    'recursive': {'extraction': 'recursive'},
+    'full-expansion': {'incremental': False},
+    'relevance': {'relevance': True},
+    'symmetry': {'symmetry': True},
+    'relevance-symmetry': {'relevance': True, 'symmetry': True},
+    'seeded': {'seed': 1},
+    'exact-nogoods': {'nogood': 'exact'},
+    'sat': {'engine': 'sat'},
+    'forward': {'engine': 'forward'},
+    'numpy': {'mutex_backend': 'numpy'},
+}
+# Configurations whose plans do not always have the fewest layers, only their validity is checked
+NOT_SHORTEST = {'forward'}
+# Configurations that must find the same plans as another one, with the same search counters
+SAME_SEARCH = {'recursive': 'graphplan'}
+# Number of layers of the shortest plans of the bundled examples (None if there is no plan): the goal of r_fact0.txt holds
+# in the initial state, the rockets of r_fact1.txt have no fuel, and the goal of r_fact5.txt appears without mutexes but
+# needs three destinations for two rockets that can only move once, so only the nogoods prove that there is no plan
+EXPECTED_LAYERS = {
+    'r_fact0.txt': 0,
+    'r_fact1.txt': None,
+    'r_fact2.txt': 3,
+    'r_fact3.txt': 6,
+    'r_fact4.txt': 3,
+    'r_fact5.txt': None,
+    'r_fact6.txt': 3,
+    'r_fact8.txt': 3,
+    'r_fact9.txt': 6,
+    'my_r_fact3.txt': 3,
+    'my_r_fact9.txt': 3,
+}
+
+
+def get_label(r_fact, r_ops, configuration):
+    """
+    Returns the label of a case in the output of the regression.
+    :return: str
+    """
+    return f'{os.path.basename(r_fact)} {configuration} {"r_ops" if r_ops else "built-in"}'
+
+
+def run_case(r_fact, r_ops, configuration):
+    """
+    Solves a problem with a configuration and validates the plan.
+    :return: dict
+    """
+    stats = SolverStats()
+    result, gp, layered_plan = run_graphplan(r_fact, r_ops, stats=stats, **CONFIGURATIONS[configuration])
+    if gp is None:
+        return result
+    result['counters'] = [sum(stats.nodes), sum(stats.backtracks), stats.nogood_hits, stats.nogood_misses]
+    result['errors'] = PlanValidator(gp.rd).validate(layered_plan) if layered_plan is not None else []
+    return result
+
+
+def check_result(result, configuration, name):
+    """
+    Returns the reasons why a result is a regression, an empty list if it is not.
+    :return: list of str
+    """
+    if result['status'] in ('error', 'crashed'):
+        return [result.get('error', result['status'])]
+    if result['status'] == 'timeout':
+        return ['the case did not finish before the timeout']
+    failures = list(result['errors'])
+    expected = EXPECTED_LAYERS.get(name, -1)
+    if expected == -1:
+        return failures
+    if expected is None and result['status'] == 'solved':
+        failures.append('a plan was found for a problem without plan')
+    elif expected is not None and result['status'] == 'no-plan':
+        failures.append('no plan was found')
+    elif expected is not None and configuration not in NOT_SHORTEST and result['layers'] != expected:
+        failures.append(f'{result["layers"]} layers instead of {expected}')
+    return failures
+
+
+def compare_searches(results):
+    """
+    Returns the differences between the plans and the search counters (nodes, backtracks, nogood hits and misses) of the
+    configurations of SAME_SEARCH and of their reference configurations.
+    :param results: dict from (r_fact, r_ops, configuration) to the result of run_case
+    :return: list of str
+    """
+    failures = []
+    for (r_fact, r_ops, configuration), result in results.items():
+        reference = results.get((r_fact, r_ops, SAME_SEARCH.get(configuration)))
+        if reference is None or 'counters' not in result or 'counters' not in reference:
+            continue
+        label = get_label(r_fact, r_ops, configuration) + ': '
+        if result.get('plan') != reference.get('plan'):
+            failures.append(label + f'the plan differs from the {SAME_SEARCH[configuration]} plan')
+        if result['counters'] != reference['counters']:
+            failures.append(label + f'counters {result["counters"]} instead of {reference["counters"]} with '
+                                    f'{SAME_SEARCH[configuration]} (nodes, backtracks, nogood hits and misses)')
+    return failures
+
+
+def check_simulations(directory):
+    """
+    Validates the reference plans of the simulation_factN.txt files against the problems of the r_factN.txt files.
+    :return: list of str, the reasons of the failures
+    """
+    failures = []
+    for path in sorted(glob.glob(os.path.join(directory, 'simulation_fact*.txt'))):
+        r_fact = os.path.join(directory, os.path.basename(path).replace('simulation_', 'r_'))
+        if not os.path.exists(r_fact):
+            continue
+        validator = PlanValidator(GraphPlan(r_fact).rd)
+        for k, layered_plan in enumerate(validator.read_simulation(path), 1):
+            errors = validator.validate(layered_plan)
+            print(f'{os.path.basename(path):22s} reference plan {k}: {"valid" if not errors else "INVALID"}')
+            failures.extend(f'{os.path.basename(path)} plan {k}: {error}' for error in errors)
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solves the bundled examples with every configuration of the planner, '
+                                                 'validates the plans and checks their number of layers.')
+    parser.add_argument('paths', nargs='*', default=['examples'], help='r_fact files, directories or glob patterns')
+    parser.add_argument('--configurations', default=','.join(CONFIGURATIONS), help='comma-separated configurations')
+    parser.add_argument('--ops', default='examples/r_ops.txt', help='r_ops file, each case is also solved with it ('
+                                                                  'empty string to only use the built-in actions)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--timeout', type=float, default=900, help='maximal wall time in seconds for each case, a case '
+                                                                    'that exceeds it is a failure')
+    args = parser.parse_args()
+
+    configurations = args.configurations.split(',')
+    if 'numpy' in configurations and importlib.util.find_spec('numpy') is None:
+        print('NumPy is not installed, skipping the numpy configuration')
+        configurations.remove('numpy')
+    cases = {}
+    for r_fact in find_problems(args.paths):
+        for configuration in configurations:
+            for r_ops in (None, args.ops) if args.ops else (None,):
+                cases[get_label(r_fact, r_ops, configuration)] = (r_fact, r_ops, configuration)
+
+    failures = []
+    timeouts = 0
+    results = {}
+    pool = WorkerPool(max(1, min(args.workers, len(cases))), task=run_case)
+    try:
+        for label, result in pool.run(list(cases.values()), args.timeout, labels=list(cases)):
+            r_fact, r_ops, configuration = cases[label]
+            results[r_fact, r_ops, configuration] = result
+            case_failures = check_result(result, configuration, os.path.basename(r_fact))
+            timeouts += result['status'] == 'timeout'
+            print(f'{label:40s} {result["status"]:8s} layers={result.get("layers")} '
+                  f'{result.get("wall_time", 0):.2f}s {"FAILED" if case_failures else ""}', flush=True)
+            failures.extend(f'{label}: {failure}' for failure in case_failures)
+    finally:
+        pool.close()
+    failures.extend(compare_searches(results))
+    for directory in sorted({os.path.dirname(r_fact) for r_fact in find_problems(args.paths)}):
+        failures.extend(check_simulations(directory))
+
+    print(f'\n{len(cases)} cases, {timeouts} timeouts, {len(failures)} failures')
+    for failure in failures:
+        print(f'\t{failure}')
+    sys.exit(1 if failures else 0)
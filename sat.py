@@ -0,0 +1,311 @@
+import heapq
+
+
+def luby(i):
+    """
+    Returns the term of index i (starting at 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+    :param i: int
+    :return: int
+    """
+    size = 1
+    while size < i + 1:
+        size = 2 * size + 1
+    while size - 1 != i:
+        size >>= 1
+        i %= size
+    return (size + 1) >> 1
+
+
+class SatSolver:
+    """
+    CDCL SAT solver: two watched literals (binary clauses are kept in implication lists), first-UIP clause learning with
+    local minimization, VSIDS branching with phase saving, and Luby restarts.
+    Variables are numbered from 1 and literals are non-zero ints (-v is the negation of v), as in the DIMACS format.
+    The optional Budget object is checked at each conflict, a conflict counting as a search node.
+    """
+    RESTART_BASE = 100
+    VARIABLE_DECAY = 0.95
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.nb_vars = 0
+        # Indexed by literal index 2 * v + (literal < 0): 1 if the literal is true, -1 if false, 0 if unassigned
+        self.values = [0, 0]
+        # Indexed by literal index: clauses (lists of literals) watching the literal, and (implied literal, clause) pairs
+        # of the binary clauses including the negation of the literal
+        self.watches = [[], []]
+        self.implications = [[], []]
+        # Indexed by variable
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        self.seen = [False]
+        self.trail = []
+        # trail_limits[l] = length of the trail when the decision of level l + 1 was made
+        self.trail_limits = []
+        self.queue_head = 0
+        self.heap = []
+        self.variable_increment = 1.0
+        self.inconsistent = False
+        self.conflicts = 0
+        self.decisions = 0
+        self.learnt_clauses = 0
+
+    def new_var(self):
+        self.nb_vars += 1
+        self.values += [0, 0]
+        self.watches += [[], []]
+        self.implications += [[], []]
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        self.seen.append(False)
+        heapq.heappush(self.heap, (0.0, self.nb_vars))
+        return self.nb_vars
+
+    @staticmethod
+    def index(literal):
+        return 2 * literal if literal > 0 else -2 * literal + 1
+
+    def value(self, literal):
+        return self.values[2 * literal if literal > 0 else -2 * literal + 1]
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, which must be done before solve or at decision level 0.
+        :param literals: iterable of literals
+        :return: boolean, False if the formula is now known to be unsatisfiable
+        """
+        if self.inconsistent:
+            return False
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value == 1 or -literal in clause:
+                return True
+            if value == 0 and literal not in clause:
+                clause.append(literal)
+        if not clause:
+            self.inconsistent = True
+            return False
+        if len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.inconsistent = True
+                return False
+            return True
+        self.attach(clause)
+        return True
+
+    def attach(self, clause):
+        if len(clause) == 2:
+            a, b = clause
+            self.implications[self.index(-a)].append((b, clause))
+            self.implications[self.index(-b)].append((a, clause))
+        else:
+            self.watches[self.index(clause[0])].append(clause)
+            self.watches[self.index(clause[1])].append(clause)
+
+    def assign(self, literal, reason):
+        variable = literal if literal > 0 else -literal
+        self.values[2 * variable] = 1 if literal > 0 else -1
+        self.values[2 * variable + 1] = -1 if literal > 0 else 1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates the assignments of the trail not propagated yet.
+        :return: the conflicting clause, or None
+        """
+        values = self.values
+        while self.queue_head < len(self.trail):
+            literal = self.trail[self.queue_head]
+            self.queue_head += 1
+            index = 2 * literal if literal > 0 else -2 * literal + 1
+            for implied, clause in self.implications[index]:
+                value = values[2 * implied if implied > 0 else -2 * implied + 1]
+                if value == -1:
+                    return clause
+                if value == 0:
+                    self.assign(implied, clause)
+            # Clauses watching the literal that became false
+            false_literal = -literal
+            false_index = index ^ 1
+            watches = self.watches[false_index]
+            i = j = 0
+            end = len(watches)
+            while i < end:
+                clause = watches[i]
+                i += 1
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                if values[2 * first if first > 0 else -2 * first + 1] == 1:
+                    watches[j] = clause
+                    j += 1
+                    continue
+                for k in range(2, len(clause)):
+                    other = clause[k]
+                    if values[2 * other if other > 0 else -2 * other + 1] != -1:
+                        clause[1], clause[k] = other, false_literal
+                        self.watches[2 * other if other > 0 else -2 * other + 1].append(clause)
+                        break
+                else:
+                    watches[j] = clause
+                    j += 1
+                    if values[2 * first if first > 0 else -2 * first + 1] == -1:
+                        while i < end:
+                            watches[j] = watches[i]
+                            i += 1
+                            j += 1
+                        del watches[j:]
+                        return clause
+                    self.assign(first, clause)
+            del watches[j:]
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the first-UIP clause learnt from the conflict, its asserting literal first and a literal of the backjump
+        level second, and the backjump level.
+        :param conflict: list of literals
+        :return: list of literals, int
+        """
+        seen = self.seen
+        levels = self.levels
+        level = len(self.trail_limits)
+        learnt = [0]
+        counter = 0
+        literal = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in clause:
+                if other == literal:
+                    continue
+                variable = other if other > 0 else -other
+                if not seen[variable] and levels[variable] > 0:
+                    seen[variable] = True
+                    self.bump(variable)
+                    if levels[variable] == level:
+                        counter += 1
+                    else:
+                        learnt.append(other)
+            while not seen[abs(self.trail[index])]:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            variable = abs(literal)
+            seen[variable] = False
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reasons[variable]
+        learnt[0] = -literal
+        # Local minimization: a literal implied by other literals of the clause is redundant
+        minimized = [learnt[0]]
+        for other in learnt[1:]:
+            reason = self.reasons[abs(other)]
+            if reason is None or any(not seen[abs(x)] and levels[abs(x)] > 0 for x in reason if x != -other):
+                minimized.append(other)
+        for other in learnt[1:]:
+            seen[abs(other)] = False
+        if len(minimized) == 1:
+            return minimized, 0
+        best = max(range(1, len(minimized)), key=lambda k: levels[abs(minimized[k])])
+        minimized[1], minimized[best] = minimized[best], minimized[1]
+        return minimized, levels[abs(minimized[1])]
+
+    def bump(self, variable):
+        activity = self.activity[variable] + self.variable_increment
+        self.activity[variable] = activity
+        if activity > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.variable_increment *= 1e-100
+            self.heap = [(-self.activity[v], v) for v in range(1, self.nb_vars + 1) if not self.values[2 * v]]
+            heapq.heapify(self.heap)
+        elif not self.values[2 * variable]:
+            heapq.heappush(self.heap, (-activity, variable))
+
+    def cancel_until(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        limit = self.trail_limits[level]
+        for literal in self.trail[limit:]:
+            variable = literal if literal > 0 else -literal
+            self.values[2 * variable] = self.values[2 * variable + 1] = 0
+            self.reasons[variable] = None
+            self.phases[variable] = literal > 0
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[limit:]
+        del self.trail_limits[level:]
+        self.queue_head = limit
+        if len(self.heap) > 8 * self.nb_vars:
+            # Drop the outdated entries
+            self.heap = [(-self.activity[v], v) for v in range(1, self.nb_vars + 1) if not self.values[2 * v]]
+            heapq.heapify(self.heap)
+
+    def pick_branching_variable(self):
+        heap = self.heap
+        while heap:
+            activity, variable = heapq.heappop(heap)
+            if not self.values[2 * variable] and -activity == self.activity[variable]:
+                return variable
+        return 0
+
+    def solve(self):
+        """
+        Returns wether or not the formula is satisfiable, the model being then available through model.
+        :return: boolean
+        """
+        if self.inconsistent or self.propagate() is not None:
+            self.inconsistent = True
+            return False
+        restarts = 0
+        while True:
+            conflict_limit = self.conflicts + luby(restarts) * self.RESTART_BASE
+            restarts += 1
+            status = self.search(conflict_limit)
+            if status is not None:
+                return status
+            self.cancel_until(0)
+
+    def search(self, conflict_limit):
+        """
+        Runs the CDCL loop until the formula is solved or the number of conflicts reaches the limit (restart).
+        :return: boolean, or None for a restart
+        """
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if self.budget is not None:
+                    self.budget.check(node=True)
+                if not self.trail_limits:
+                    self.inconsistent = True
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.learnt_clauses += 1
+                    self.assign(learnt[0], learnt)
+                self.variable_increment /= self.VARIABLE_DECAY
+                continue
+            if self.conflicts >= conflict_limit:
+                return None
+            variable = self.pick_branching_variable()
+            if not variable:
+                return True
+            self.decisions += 1
+            self.trail_limits.append(len(self.trail))
+            self.assign(variable if self.phases[variable] else -variable, None)
+
+    def model(self, variable):
+        return self.values[2 * variable] == 1
@@ -0,0 +1,94 @@
+from domain import bits
+from sat import SatSolver
+
+
+class GraphEncoding:
+    """
+    CNF encoding of the layers 0 to k of a planning graph for a goal (graph-based encoding, as in Blackbox), restricted to
+    the propositions and actions that can support the goal backward from layer k:
+    - the goal propositions hold in layer k,
+    - a proposition of layer t > 0 holds only if one of its providers in layer t is in the plan,
+    - an action of layer t > 1 is in the plan only if its preconditions hold in layer t - 1 (layer 0 always holds),
+    - mutex actions (and mutex propositions) of a layer are not both in the plan (not both true).
+    """
+    def __init__(self, gp, goal, k, budget=None):
+        self.gp = gp
+        self.k = k
+        self.solver = SatSolver(budget)
+        self.nb_clauses = 0
+        # proposition_vars[t][prop_id] and action_vars[t][action_id] are the variables of layer t, for t from 1 to k
+        self.proposition_vars = [{} for _ in range(k + 1)]
+        self.action_vars = [{} for _ in range(k + 1)]
+        # Bitsets of the propositions and actions encoded in each layer
+        self.needed_propositions = [0] * (k + 1)
+        self.needed_actions = [0] * (k + 1)
+        self.encode(goal)
+
+    def add_clause(self, literals):
+        self.nb_clauses += 1
+        self.solver.add_clause(literals)
+
+    def encode(self, goal):
+        adders = self.gp.rd.interference.adders
+        needed = goal
+        for t in range(self.k, 0, -1):
+            actions = 0
+            for prop_id in bits(needed):
+                actions |= adders[prop_id]
+            actions &= self.gp.layers[t].actions
+            self.needed_propositions[t] = needed
+            self.needed_actions[t] = actions
+            needed = 0
+            for action in self.gp.rd.actions_of(actions):
+                needed |= action.preconditions_mask
+        for t in range(1, self.k + 1):
+            for prop_id in bits(self.needed_propositions[t]):
+                self.proposition_vars[t][prop_id] = self.solver.new_var()
+            for action_id in bits(self.needed_actions[t]):
+                self.action_vars[t][action_id] = self.solver.new_var()
+
+        for prop_id in bits(goal):
+            self.add_clause([self.proposition_vars[self.k][prop_id]])
+        for t in range(1, self.k + 1):
+            layer = self.gp.layers[t]
+            proposition_vars = self.proposition_vars[t]
+            action_vars = self.action_vars[t]
+            for prop_id, var in proposition_vars.items():
+                self.add_clause([-var] + [action_vars[action_id] for action_id in bits(adders[prop_id] & self.needed_actions[t])])
+                for other_id in bits(layer.mutex_propositions.get(prop_id, 0) & self.needed_propositions[t] >> prop_id + 1 << prop_id + 1):
+                    self.add_clause([-var, -proposition_vars[other_id]])
+            for action_id, var in action_vars.items():
+                if t > 1:
+                    for prop_id in bits(self.gp.rd.actions[action_id].preconditions_mask):
+                        self.add_clause([-var, self.proposition_vars[t - 1][prop_id]])
+                for other_id in bits(layer.mutex_actions.get(action_id, 0) & self.needed_actions[t] >> action_id + 1 << action_id + 1):
+                    self.add_clause([-var, -action_vars[other_id]])
+
+    def solve(self):
+        return self.solver.solve()
+
+    def get_layered_plan(self, goal):
+        """
+        Returns the layered plan of the model, in the format of GraphPlan.extract: for each layer from 1 to k, the actions
+        of the model supporting the goal, a true No-op action being preferred for each proposition.
+        :param goal: a bitset of propositions
+        :return: a list of sets of Action objects
+        """
+        adders = self.gp.rd.interference.adders
+        layered_plan = []
+        needed = goal
+        for t in range(self.k, 0, -1):
+            chosen = 0
+            for prop_id in bits(needed):
+                if chosen & adders[prop_id]:
+                    continue
+                providers = [action for action in self.gp.rd.actions_of(adders[prop_id] & self.needed_actions[t])
+                             if self.solver.model(self.action_vars[t][action.id])]
+                chosen |= 1 << min(providers, key=lambda action: (action.name != 'NOOP', action.id)).id
+            actions = self.gp.rd.actions_of(chosen)
+            layered_plan.append(set(actions))
+            needed = 0
+            for action in actions:
+                needed |= action.preconditions_mask
+        layered_plan.reverse()
+        return layered_plan
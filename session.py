@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+import os
+
+from graphplan import DeltaMap, GraphPlan
+from nogood import NogoodStore
+from domain import Proposition
+
+# Version of the on-disk graph format, part of the cache key
+GRAPH_FORMAT = 1
+
+
+class PlanningSession:
+    """
+    Planning graph of one initial state, kept to answer successive goal queries.
+    The graph is only expanded when a query needs more layers, and each goal has its own nogood store.
+    With a cache_dir, the graph is saved there after the queries that expanded it and loaded back by the next session of the
+    same problem (same objects, initial state and actions), in a gzipped JSON file named after a hash of the problem.
+    """
+    def __init__(self, r_fact, r_ops=None, cache_dir=None, **options):
+        """
+        :param r_fact: path of a r_fact file giving the objects and the initial state (its goal is the default query)
+        :param r_ops: path of a r_ops file to ground the actions from, or None for the built-in rocket actions
+        :param cache_dir: directory of the saved graphs, or None to keep the graph in memory only
+        :param options: other GraphPlan arguments
+        """
+        if options.get('relevance'):
+            raise ValueError('A session answers any goal, its graph cannot be pruned for the goal of the r_fact file')
+        self.gp = GraphPlan(r_fact, r_ops, **options)
+        self.rd = self.gp.rd
+        # nogoods[goal] = NogoodStore object of the goal (bitset of propositions)
+        self.nogoods = {}
+        self.key = self.get_key()
+        self.cache_dir = cache_dir
+        self.saved_layers = 0
+        if cache_dir is not None and os.path.exists(self.cache_path):
+            self.load(self.cache_path)
+
+    @property
+    def cache_path(self):
+        return os.path.join(self.cache_dir, f'{self.key}.graph.json.gz')
+
+    def get_key(self):
+        """
+        Returns a hash of everything the graph depends on: the propositions and actions with their ids, and the initial state.
+        :return: str
+        """
+        digest = hashlib.sha256(f'{GRAPH_FORMAT}\n'.encode())
+        for prop in self.rd.propositions:
+            digest.update(f'{prop.name} {" ".join(prop.args)}\n'.encode())
+        for action in self.rd.actions:
+            digest.update(f'{action}\n'.encode())
+        digest.update(f'{self.rd.init_mask:x}'.encode())
+        return digest.hexdigest()[:32]
+
+    def get_goal_mask(self, goal):
+        """
+        Returns the bitset of a goal, or None if one of its propositions is not in the domain (it can never be reached).
+        :param goal: iterable of Proposition objects or of strings written as in the r_fact files, like '(at c1 London)'
+        :return: int or None
+        """
+        mask = 0
+        for prop in goal:
+            if isinstance(prop, str):
+                l = prop.replace('(', '').replace(')', '').strip().split()
+                prop = Proposition(l[0], l[1:])
+            interned = self.rd.proposition_table.get(prop)
+            if interned is None:
+                return None
+            mask |= 1 << interned.id
+        return mask
+
+    def solve(self, goal=None):
+        """
+        Returns a layered plan for the goal, from the initial state of the session.
+        :param goal: iterable of propositions (see get_goal_mask), or None for the goal of the r_fact file
+        :return: a list of sets of Action objects (a layered plan) or None (if the goal is unreachable)
+        """
+        goal = self.rd.goal_mask if goal is None else self.get_goal_mask(goal)
+        if goal is None:
+            return None
+        nogood = self.nogoods.get(goal)
+        if nogood is None:
+            nogood = self.nogoods[goal] = NogoodStore(self.gp.nogood.canonicalize, self.gp.nogood.subset)
+        # The graph may have grown since the last query for this goal
+        while len(nogood.recorded) < len(self.gp.layers):
+            nogood.add_layer()
+        self.gp.nogood = nogood
+        layered_plan = self.gp.graphplan(goal)
+        if self.cache_dir is not None and len(self.gp.layers) > self.saved_layers:
+            self.save(self.cache_path)
+        return layered_plan
+
+    def save(self, path):
+        """
+        Writes the layers of the graph to a gzipped JSON file, bitsets being written in hexadecimal.
+        A layer that is the same object as the previous one (the graph leveled off) is written as null.
+        """
+        layers = []
+        for i, layer in enumerate(self.gp.layers):
+            if i > 0 and layer is self.gp.layers[i - 1]:
+                layers.append(None)
+                continue
+            layers.append({
+                'actions': f'{layer.actions:x}',
+                'propositions': f'{layer.propositions:x}',
+                'added_actions': f'{layer.added_actions:x}',
+                'added_propositions': f'{layer.added_propositions:x}',
+                # Only the differences with the previous layer, as in memory
+                'mutex_actions': {key: f'{value:x}' for key, value in layer.mutex_actions.changes.items()},
+                'mutex_propositions': {key: f'{value:x}' for key, value in layer.mutex_propositions.changes.items()},
+            })
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Written to a temporary file first, so that a concurrent session never loads a partial graph
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with gzip.open(temporary_path, 'wt') as f:
+            json.dump({'format': GRAPH_FORMAT, 'key': self.key, 'layers': layers}, f, separators=(',', ':'))
+        os.replace(temporary_path, path)
+        self.saved_layers = len(self.gp.layers)
+
+    def load(self, path):
+        """
+        Replaces the graph by the one saved in the file, if it was saved for the same problem.
+        """
+        with gzip.open(path, 'rt') as f:
+            saved = json.load(f)
+        if saved['format'] != GRAPH_FORMAT or saved['key'] != self.key:
+            return
+        gp = self.gp
+        gp.layers = []
+        for i, saved_layer in enumerate(saved['layers']):
+            if saved_layer is None:
+                gp.layers.append(gp.layers[-1])
+            else:
+                layer = gp.Layer()
+                layer.actions = int(saved_layer['actions'], 16)
+                layer.propositions = int(saved_layer['propositions'], 16)
+                layer.added_actions = int(saved_layer['added_actions'], 16)
+                layer.added_propositions = int(saved_layer['added_propositions'], 16)
+                parent = gp.layers[-1] if gp.layers else None
+                layer.mutex_actions = DeltaMap(parent and parent.mutex_actions,
+                                               {int(key): int(value, 16) for key, value in saved_layer['mutex_actions'].items()})
+                layer.mutex_propositions = DeltaMap(parent and parent.mutex_propositions,
+                                                    {int(key): int(value, 16) for key, value in saved_layer['mutex_propositions'].items()})
+                layer.mutex_actions.freeze()
+                layer.mutex_propositions.freeze()
+                gp.layers.append(layer)
+                gp.set_levels(layer.added_propositions, i)
+            if i > 0 and gp.stats is not None:
+                gp.stats.add_layer()
+        self.saved_layers = len(gp.layers)
@@ -0,0 +1,70 @@
+class SolverStats:
+    """
+    Counters and timers of a GraphPlan run.
+    GraphPlan only updates them when it is given a SolverStats object, so they cost nothing when disabled.
+    The optional hook is called as hook(event, stats) after each layer is built ('layer'), after each attempt to extract the
+    goal from a layer ('extraction') and at the end of the run ('done').
+    """
+    def __init__(self, hook=None):
+        self.hook = hook
+        # Indexed by layer: time spent building the layer and number of mutex pairs checked to build it
+        self.expand_time = [0.0]
+        self.mutex_checks = [0]
+        # Indexed by layer: time spent extracting the goal from the layer (over all attempts), and search nodes and
+        # backtracks of gp_search in the layer (the forward engine counts its time and expanded states in layer 0)
+        self.extract_time = [0.0]
+        self.nodes = [0]
+        self.backtracks = [0]
+        self.providers_calls = 0
+        self.nogood_hits = 0
+        self.nogood_misses = 0
+        # Nogoods kept by the store (minimal ones with subset lookups) and their mean number of propositions
+        self.nogood_size = 0
+        self.nogood_length = 0.0
+        # Actions and propositions left out of the graph by the relevance analysis
+        self.pruned_actions = 0
+        self.pruned_propositions = 0
+        # Forward engine: heuristic values computed and read from the cache
+        self.heuristic_evaluations = 0
+        self.heuristic_cache_hits = 0
+        # Providers skipped as symmetric to a previous one
+        self.symmetric_providers = 0
+        # SAT engine: conflicts and decisions of the CDCL solver over all layers
+        self.sat_conflicts = 0
+        self.sat_decisions = 0
+
+    def add_layer(self):
+        self.expand_time.append(0.0)
+        self.mutex_checks.append(0)
+        self.extract_time.append(0.0)
+        self.nodes.append(0)
+        self.backtracks.append(0)
+
+    def emit(self, event):
+        if self.hook is not None:
+            self.hook(event, self)
+
+    def as_dict(self):
+        """
+        Returns the counters and timers, with their totals, as a JSON-serializable dict.
+        :return: dict
+        """
+        return {
+            'expand_time': self.expand_time, 'total_expand_time': sum(self.expand_time),
+            'extract_time': self.extract_time, 'total_extract_time': sum(self.extract_time),
+            'mutex_checks': self.mutex_checks, 'total_mutex_checks': sum(self.mutex_checks),
+            'nodes': self.nodes, 'total_nodes': sum(self.nodes),
+            'backtracks': self.backtracks, 'total_backtracks': sum(self.backtracks),
+            'providers_calls': self.providers_calls,
+            'nogood_hits': self.nogood_hits,
+            'nogood_misses': self.nogood_misses,
+            'nogood_size': self.nogood_size,
+            'nogood_length': self.nogood_length,
+            'pruned_actions': self.pruned_actions,
+            'pruned_propositions': self.pruned_propositions,
+            'heuristic_evaluations': self.heuristic_evaluations,
+            'heuristic_cache_hits': self.heuristic_cache_hits,
+            'symmetric_providers': self.symmetric_providers,
+            'sat_conflicts': self.sat_conflicts,
+            'sat_decisions': self.sat_decisions,
+        }
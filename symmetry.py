@@ -0,0 +1,120 @@
+from domain import Proposition
+
+
+class Symmetry:
+    """
+    Symmetries of a problem: groups of interchangeable objects of the same type, such that exchanging two objects of a group
+    maps the initial state and the actions onto themselves. Any permutation of the objects inside groups is then a symmetry,
+    and the planning graph is invariant by it.
+    - A goal is unreachable from a layer if and only if its image by a symmetry is, so goals are mapped to a canonical image
+      before the nogood lookups (best-effort: two goals of the same orbit may get different images, which is sound).
+    - During the extraction, exchanging objects that appear neither in the goal nor in the plan does not change the search,
+      so among the providers that only differ by such free objects, only the first one is tried.
+    The groups only depend on the initial state and the actions the graph can contain (allowed_actions, all of them unless
+    the graph is pruned by relevance), so without pruning they hold for any goal (a session reuses them for all its
+    queries). The roles of the objects in the goal are taken into account when the goal is searched: canonicalize orders
+    the objects of each group by their roles in the goal it maps, and the objects of the goal are never free.
+    """
+    def __init__(self, rd, allowed_actions=None):
+        self.rd = rd
+        # Bitset of the actions the graph can contain, or None for all the actions
+        self.allowed_actions = allowed_actions
+        self.groups = self.get_groups()
+        # group_of[object] = index of its group, for the objects of groups of at least two objects
+        self.group_of = {obj: k for k, group in enumerate(self.groups) for obj in group}
+        self.canonical_goals = {}
+        self.pruned_providers = 0
+
+    def get_groups(self):
+        """
+        Returns the groups of interchangeable objects (objects with identical initial roles), with at least two objects each.
+        :return: list of lists of objects, sorted by name
+        """
+        init = {(prop.name, tuple(prop.args)) for prop in self.rd.init_propositions}
+        actions = {self.get_signature(action) for action in self.rd.actions
+                   if self.allowed_actions is None or self.allowed_actions >> action.id & 1}
+        groups = []
+        for objects in (self.rd.cargos, self.rd.rockets, self.rd.places):
+            classes = []
+            for obj in sorted(objects):
+                for group in classes:
+                    swap = {obj: group[0], group[0]: obj}
+                    if self.is_invariant(init, swap) and self.is_invariant(actions, swap):
+                        group.append(obj)
+                        break
+                else:
+                    classes.append([obj])
+            groups.extend(group for group in classes if len(group) > 1)
+        return groups
+
+    @staticmethod
+    def get_signature(action):
+        """
+        Returns the name and the objects of an action, those of its proposition for a No-op action.
+        :param action: Action object
+        :return: tuple (str, tuple of objects)
+        """
+        if action.name == 'NOOP':
+            return f'NOOP {action.args[0].name}', tuple(action.args[0].args)
+        return action.name, tuple(action.args)
+
+    @staticmethod
+    def is_invariant(items, permutation):
+        return all((name, tuple(permutation.get(arg, arg) for arg in args)) in items for name, args in items)
+
+    def canonicalize(self, goal):
+        """
+        Returns the image of a goal by a symmetry that orders the objects of each group by their roles in the goal.
+        :param goal: bitset of propositions
+        :return: bitset of propositions
+        """
+        canonical = self.canonical_goals.get(goal)
+        if canonical is not None:
+            return canonical
+        propositions = self.rd.propositions_of(goal)
+        roles = {}
+        for prop in propositions:
+            for obj in prop.args:
+                if obj in self.group_of:
+                    roles.setdefault(obj, []).append((prop.name, tuple('*' if arg == obj else arg for arg in prop.args)))
+        permutation = {}
+        for group in self.groups:
+            ordered = sorted(group, key=lambda obj: (sorted(roles.get(obj, ())), obj))
+            ordered.sort(key=lambda obj: obj not in roles)
+            permutation.update(zip(ordered, group))
+        canonical = 0
+        for prop in propositions:
+            image = self.rd.proposition_table.get(Proposition(prop.name, [permutation.get(arg, arg) for arg in prop.args]))
+            if image is None or image.id < 0:
+                canonical = goal
+                break
+            canonical |= 1 << image.id
+        self.canonical_goals[goal] = canonical
+        return canonical
+
+    def prune_providers(self, providers, goal, current_plan):
+        """
+        Returns the providers without those that are the image of a previous one by a permutation of free objects.
+        :param providers: list of Action objects
+        :param goal: bitset of propositions
+        :param current_plan: set of Action objects
+        :return: list of Action objects
+        """
+        busy = set()
+        for prop in self.rd.propositions_of(goal):
+            busy.update(prop.args)
+        for action in current_plan:
+            busy.update(self.get_signature(action)[1])
+        kept = []
+        keys = set()
+        for action in providers:
+            name, args = self.get_signature(action)
+            free = {}
+            key = (name, tuple((self.group_of[arg], free.setdefault(arg, len(free))) if arg in self.group_of and arg not in busy
+                               else arg for arg in args))
+            if key in keys:
+                self.pruned_providers += 1
+                continue
+            keys.add(key)
+            kept.append(action)
+        return kept
@@ -0,0 +1,44 @@
+# Trace levels, each one includes the messages of the previous ones
+OFF = 0
+# Start and end of the expansion and extraction phases, and the final plan
+SUMMARY = 1
+# Content of each layer of the planning graph
+LAYER = 2
+# Every step of the backtracking search
+FULL = 3
+
+
+class TraceSink:
+    """
+    Streams the trace of a GraphPlan run to a file.
+    Callers check `level` before formatting a message, so that nothing is built for the messages that would be dropped.
+    """
+    def __init__(self, level=OFF, path=None, stream=None, buffering=1 << 16):
+        """
+        :param level: one of OFF, SUMMARY, LAYER and FULL
+        :param path: path of the file to write the trace to, opened on the first write
+        :param stream: already opened text stream to write the trace to instead of path (it is not closed by the sink)
+        :param buffering: size in bytes of the file buffer
+        """
+        self.level = level if path is not None or stream is not None else OFF
+        self.path = path
+        self.stream = stream
+        self.buffering = buffering
+        self.owns_stream = stream is None
+
+    def write(self, message):
+        if self.stream is None:
+            self.stream = open(self.path, 'w', buffering=self.buffering)
+        self.stream.write(message)
+
+    def close(self):
+        """
+        Flushes the trace, and closes the file if the sink opened it.
+        """
+        if self.stream is None:
+            return
+        if self.owns_stream:
+            self.stream.close()
+            self.stream = None
+        else:
+            self.stream.flush()
@@ -0,0 +1,124 @@
+import re
+
+
+class PlanValidator:
+    """
+    Replays layered plans (lists of sets of Action objects, as returned by GraphPlan.graphplan) on bitset states of a
+    RocketDomain. A layer is valid if the preconditions of all its actions hold in the current state and no action of the
+    layer deletes a precondition or a positive effect of another one (so the layer can be executed in any order), and the
+    plan is valid if every layer is and the goal holds in the final state.
+    """
+    # Sequential plan steps of the simulation_fact files, like LOAD_alex_r1_London
+    STEP = re.compile(r'^\s*([A-Z]+(?:_\S+)+)\s*$')
+
+    def __init__(self, rd):
+        self.rd = rd
+        # Actions by name, as written by str(action) and in the simulation_fact files
+        self.actions_by_name = {}
+        for action in rd.actions:
+            self.actions_by_name[str(action)] = action
+            if action.name != 'NOOP':
+                self.actions_by_name['_'.join([action.name] + list(action.args))] = action
+
+    def is_valid(self, layered_plan, init=None, goal=None):
+        """
+        Returns wether or not the plan is valid, without explaining why (see validate).
+        :param layered_plan: list of sets of Action objects
+        :param init: bitset of propositions, the initial state of the domain by default
+        :param goal: bitset of propositions, the goal of the domain by default
+        :return: boolean
+        """
+        state = self.rd.init_mask if init is None else init
+        interference = self.rd.interference
+        for layer in layered_plan:
+            preconditions = positive_effects = negative_effects = layer_mask = 0
+            for action in layer:
+                preconditions |= action.preconditions_mask
+                positive_effects |= action.positive_effects_mask
+                negative_effects |= action.negative_effects_mask
+                layer_mask |= 1 << action.id
+            if preconditions & ~state:
+                return False
+            # An action that deletes its own precondition only interferes with the others
+            if negative_effects & (preconditions | positive_effects):
+                for action in layer:
+                    if interference.get_interfering(action) & layer_mask & ~(1 << action.id):
+                        return False
+            state = state & ~negative_effects | positive_effects
+        return not (self.rd.goal_mask if goal is None else goal) & ~state
+
+    def validate(self, layered_plan, init=None, goal=None):
+        """
+        Returns the reasons why the plan is not valid, an empty list if it is.
+        :param layered_plan: list of sets of Action objects
+        :param init: bitset of propositions, the initial state of the domain by default
+        :param goal: bitset of propositions, the goal of the domain by default
+        :return: list of str
+        """
+        errors = []
+        state = self.rd.init_mask if init is None else init
+        for i, layer in enumerate(layered_plan, 1):
+            actions = sorted(layer, key=lambda action: action.id)
+            for action in actions:
+                for prop in self.rd.propositions_of(action.preconditions_mask & ~state):
+                    errors.append(f'Layer {i}: precondition {prop} of {action} does not hold')
+            for k, action1 in enumerate(actions):
+                for action2 in actions[k + 1:]:
+                    if self.rd.interference.are_interfering(action1, action2):
+                        errors.append(f'Layer {i}: {action1} and {action2} interfere')
+            for action in actions:
+                state &= ~action.negative_effects_mask
+            for action in actions:
+                state |= action.positive_effects_mask
+        for prop in self.rd.propositions_of((self.rd.goal_mask if goal is None else goal) & ~state):
+            errors.append(f'Goal proposition {prop} does not hold at the end of the plan')
+        return errors
+
+    def validate_many(self, layered_plans, init=None, goal=None):
+        """
+        Returns wether or not each plan is valid.
+        :param layered_plans: iterable of lists of sets of Action objects
+        :return: list of booleans
+        """
+        return [self.is_valid(layered_plan, init, goal) for layered_plan in layered_plans]
+
+    def parse_plan(self, lines):
+        """
+        Returns the layered plan written in lines, one layer per line with the names of its actions separated by spaces,
+        like 'LOAD_alex_r1_London UNLOAD_bill_r1_Paris' or '[LOAD alex in r1 at London]'.
+        :param lines: iterable of str
+        :return: list of sets of Action objects
+        """
+        layered_plan = []
+        for line in lines:
+            names = re.findall(r'\[[^\]]*\]|\S+', line)
+            if not names:
+                continue
+            layer = set()
+            for name in names:
+                action = self.actions_by_name.get(name)
+                if action is None:
+                    raise ValueError(f'Unknown action {name}')
+                layer.add(action)
+            layered_plan.append(layer)
+        return layered_plan
+
+    def read_simulation(self, path):
+        """
+        Returns the sequential plans of a simulation_fact file (the steps following each 'PLAN :'), one action per layer.
+        :param path: path of a simulation_fact file
+        :return: list of lists of sets of Action objects
+        """
+        with open(path, 'r', encoding='latin-1') as f:
+            sections = re.split(r'PLAN\s*:', f.read())[1:]
+        plans = []
+        for section in sections:
+            steps = []
+            for line in section.splitlines():
+                match = self.STEP.match(line)
+                if match:
+                    steps.append(match.group(1))
+                elif steps and line.strip():
+                    break
+            plans.append(self.parse_plan(steps))
+        return plans